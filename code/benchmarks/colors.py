@@ -0,0 +1,54 @@
+"""
+Conversions per second of the colorsys based color functions and the table based ones in lightning.colors
+
+Run from the code directory:
+    python -m benchmarks.colors
+"""
+import colorsys
+
+import numpy as np
+
+from benchmarks.common import measure
+from lightning import colors
+
+BATCH = 1000
+
+
+def colorsys_hsv_to_rgb(hsv):
+    # hsv_to_rgb of the dmx controller before lightning.colors
+    r, g, b = colorsys.hsv_to_rgb(hsv[0] / 360.0, hsv[1] / 100.0, hsv[2] / 100.0)
+    return int(r * 255), int(g * 255), int(b * 255)
+
+
+def colorsys_rgb_to_hsv(rgb):
+    h, s, v = colorsys.rgb_to_hsv(rgb[0] / 255.0, rgb[1] / 255.0, rgb[2] / 255.0)
+    return int(h * 360), int(s * 100), int(v * 100)
+
+
+def rate(function, number=200):
+    return BATCH / measure(function, number=number)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    hsv = np.column_stack((rng.integers(0, 361, BATCH), rng.integers(0, 101, BATCH), rng.integers(0, 101, BATCH)))
+    hsv_tuples = [tuple(int(c) for c in color) for color in hsv]
+    # a show only uses a few rgb colors, the mood and highlight colors of the devices
+    rgb_tuples = [colors.hsv_to_rgb(color) for color in hsv_tuples[:16]] * (BATCH // 16 + 1)
+    rgb_tuples = rgb_tuples[:BATCH]
+    rgb = np.array(rgb_tuples)
+
+    results = [
+        ("hsv_to_rgb colorsys", rate(lambda: [colorsys_hsv_to_rgb(c) for c in hsv_tuples])),
+        ("hsv_to_rgb table", rate(lambda: [colors.hsv_to_rgb(c) for c in hsv_tuples])),
+        ("hsv_to_rgb_array table", rate(lambda: colors.hsv_to_rgb_array(hsv))),
+        ("rgb_to_hsv colorsys", rate(lambda: [colorsys_rgb_to_hsv(c) for c in rgb_tuples])),
+        ("rgb_to_hsv cached", rate(lambda: [colors.rgb_to_hsv(c) for c in rgb_tuples])),
+        ("rgb_to_hsv_array", rate(lambda: colors.rgb_to_hsv_array(rgb))),
+    ]
+    for name, conversions in results:
+        print(f"{name:24s} {conversions / 1e6:8.2f} M conversions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+import timeit
+
+
+def measure(func, number=1000, repeat=5):
+    """
+    Time a function with timeit and keep the best run
+    :param func: function without arguments
+    :param number: calls per run
+    :param repeat: number of runs
+    :return: best time per call in seconds
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def format_time(seconds):
+    """
+    Format a duration with a fitting unit
+    :param seconds:
+    :return: string
+    """
+    if seconds < 1e-6:
+        return f"{seconds * 1e9:8.1f} ns"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.2f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds:8.2f} s "
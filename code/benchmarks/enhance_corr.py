@@ -0,0 +1,41 @@
+"""
+Time-stretch step of the tempo estimation, interp1d against the precomputed tables
+
+Run from the code directory:
+    python -m benchmarks.enhance_corr
+"""
+import numpy as np
+from scipy.interpolate import interp1d
+
+from benchmarks.common import measure, format_time
+from signal_evaluation.tempo import CorrEnhancer, enhance_corr
+
+
+def enhance_corr_interp1d(corr):
+    """
+    Previous implementation, two interp1d objects and grids per call
+    """
+    length = len(corr)
+    x = np.arange(length)
+    interp_func_2 = interp1d(x, corr, kind='linear', fill_value="extrapolate")
+    interp_func_4 = interp1d(x, corr, kind='linear', fill_value="extrapolate")
+    x2 = np.linspace(0, length - 1, 2 * length)
+    x4 = np.linspace(0, length - 1, 4 * length)
+    return corr + interp_func_2(x2)[:length] + interp_func_4(x4)[:length]
+
+
+def main():
+    corr = np.random.default_rng(0).random(2048)
+    enhancer = CorrEnhancer(len(corr))
+    assert np.array_equal(enhance_corr_interp1d(corr), enhancer.enhance(corr))
+    assert np.array_equal(enhance_corr_interp1d(corr), enhance_corr(corr))
+
+    old = measure(lambda: enhance_corr_interp1d(corr))
+    tables = measure(lambda: enhance_corr(corr))
+    reused = measure(lambda: enhancer.enhance(corr))
+    print(f"2048 samples   interp1d {format_time(old)}   enhance_corr {format_time(tables)} ({old / tables:.1f}x)   "
+          f"CorrEnhancer {format_time(reused)} ({old / reused:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Cost of one render frame with all fixtures fading, per device loop against the FadeEngine
+
+Run from the code directory:
+    python -m benchmarks.fades
+"""
+import numpy as np
+
+from benchmarks.common import measure, format_time
+from lightning.colors import hsv_to_rgb
+from lightning.fade import FadeEngine
+
+FRAME_TIME = 1 / 44
+
+
+class LoopDevice:
+    """
+    Fade of one device in pure python, like DMXDevice.advance before the FadeEngine
+    """
+
+    def __init__(self, start_channel):
+        self.start_channel = start_channel
+        self.hsv = (0, 0, 0)
+        self.hsv_target = (0, 0, 0)
+        self.target_time = 0
+        self.r = self.g = self.b = 0
+
+    def advance(self, now, frame_time):
+        if self.hsv == self.hsv_target:
+            return
+        t_diff = max(self.target_time - now, 0)
+        if t_diff <= frame_time:
+            self.hsv = self.hsv_target
+        else:
+            steps = t_diff / frame_time
+            self.hsv = tuple(current + (target - current) / steps
+                             for current, target in zip(self.hsv, self.hsv_target))
+        self.r, self.g, self.b = hsv_to_rgb(self.hsv)
+
+
+def loop_frame(devices, frame, now):
+    for device in devices:
+        device.advance(now, FRAME_TIME)
+        start = device.start_channel - 1
+        color = bytes((device.r, device.g, device.b))
+        if frame[start:start + 3] != color:
+            frame[start:start + 3] = color
+
+
+def main():
+    rng = np.random.default_rng(0)
+    for fixtures in (4, 40, 170):
+        targets = np.column_stack((rng.uniform(0, 360, fixtures), rng.uniform(0, 100, fixtures),
+                                   rng.uniform(0, 100, fixtures)))
+        devices = [LoopDevice(3 * i + 1) for i in range(fixtures)]
+        engine = FadeEngine()
+        slots = [engine.add(3 * i + 1) for i in range(fixtures)]
+        frame = bytearray(512)
+        frame_view = np.frombuffer(bytearray(512), dtype=np.uint8)
+        now = [0.0]
+
+        def restart():
+            # keep every fixture fading towards a target one hour away
+            for device, slot, target in zip(devices, slots, targets):
+                device.hsv_target = tuple(target)
+                device.target_time = now[0] + 3600
+                engine.set_target(slot, target, now[0] + 3600)
+
+        def loop():
+            now[0] += FRAME_TIME
+            loop_frame(devices, frame, now[0])
+
+        def vectorized():
+            now[0] += FRAME_TIME
+            engine.advance(now[0], FRAME_TIME)
+            engine.write(frame_view)
+
+        restart()
+        old = measure(loop, number=200)
+        new = measure(vectorized, number=200)
+        print(f"{fixtures:4d} fixtures   per device loop {format_time(old)}   FadeEngine {format_time(new)}"
+              f"   per frame, {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
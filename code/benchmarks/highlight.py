@@ -0,0 +1,85 @@
+"""
+Cost of one highlight decision with a growing note history
+
+Compares the original list filtering, the numpy window on the NoteBuffer and the running
+velocity windows of the tracker, each right after the last note of a stress density stream.
+
+Run from the code directory:
+    python -m benchmarks.highlight
+"""
+import numpy as np
+
+from benchmarks.common import measure, format_time
+from benchmarks.streams import DENSITIES, synthetic_stream
+from midi.message import decode
+from midi.replay import VirtualClock
+from midi.tracker import MidiNoteTracker
+
+HISTORY = (1_000, 10_000, 100_000)
+
+
+def list_highlight(played_notes, now):
+    """
+    Highlight decision of the first version, played_notes is a list of (note, time, velocity)
+    """
+    if len(played_notes) < 5:
+        return False
+    played_note_velocity = played_notes[-1][2]
+    last_notes = [note for note in played_notes if note[1] > now - 2]
+    if len(last_notes[1:]) == 0:
+        return False
+    avg_velocity = np.mean([note[2] for note in last_notes[1:]])
+    std_velocity = np.std([note[2] for note in last_notes[1:]])
+    if played_note_velocity > avg_velocity + 1.2 * std_velocity:
+        return True
+    intensity_notes = [note for note in last_notes if note[1] > now - 0.1]
+    return sum([note[2] for note in intensity_notes]) > 400
+
+
+def buffer_highlight(played_notes, now):
+    """
+    Highlight decision with numpy on the window views of the NoteBuffer
+    """
+    if len(played_notes) < 5:
+        return False
+    played_note_velocity = played_notes.last()[2]
+    _, last_timings, last_velocities = played_notes.window(now - 2)
+    if len(last_velocities[1:]) == 0:
+        return False
+    avg_velocity = np.mean(last_velocities[1:])
+    std_velocity = np.std(last_velocities[1:])
+    if played_note_velocity > avg_velocity + 1.2 * std_velocity:
+        return True
+    intensity_start = np.searchsorted(last_timings, now - 0.1, side='right')
+    return np.sum(last_velocities[intensity_start:]) > 400
+
+
+def main():
+    params = DENSITIES["stress"]
+    notes_per_second = params["bpm"] / 60 * (params["chord_size"] * params["chords_per_beat"]
+                                             + params["melody_per_beat"])
+    for history in HISTORY:
+        stream = synthetic_stream(seconds=history / notes_per_second, **params)
+        clock = VirtualClock()
+        tracker = MidiNoteTracker(clock=clock, threaded=False)
+        played_list = []
+        for time, message in stream:
+            clock.now = time
+            if tracker.evaluate_midi_event(decode((message, 0.0))) == "note_on":
+                played_list.append((message[1], time, message[2]))
+        now = clock.now
+        highlight_timings = tracker.highlight_timings
+
+        def running():
+            tracker.estimate_highlight(now)
+            highlight_timings.clear()
+
+        old = measure(lambda: list_highlight(played_list, now), number=20)
+        buffered = measure(lambda: buffer_highlight(tracker.played_notes, now), number=1000)
+        new = measure(running, number=1000)
+        print(f"{len(played_list):7d} notes   list {format_time(old)}   NoteBuffer window {format_time(buffered)}"
+              f"   running windows {format_time(new)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Idle CPU and note-to-tracker latency of the two ingestion strategies without midi hardware
+
+A producer thread stands in for the rtmidi input thread. In "poll" it appends the messages to a
+deque that the consumer reads without blocking, like rtmidi's get_message in the old busy loop of
+MainLoop.main_loop. In "callback" it puts them into a queue.Queue like MidiInput._on_message and the
+consumer blocks in get(timeout=0.5) like MidiInput.get_message. The consumer feeds every message
+to a MidiNoteTracker. benchmarks.midi_input measures the same through a real rtmidi virtual port.
+
+Run from the code directory:
+    python -m benchmarks.ingestion
+"""
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+
+from midi.message import decode
+from midi.tracker import MidiNoteTracker
+
+
+def consume_poll(messages, tracker, latencies, active):
+    while active.is_set():
+        # rtmidi's get_message returns None at once if no message is waiting
+        item = messages.popleft() if messages else None
+        if item:
+            message, sent = item
+            tracker.evaluate_midi_event(decode(message))
+            if message[0][0] & 0xF0 == 0x90:
+                latencies.append(time.perf_counter() - sent)
+
+
+def consume_callback(messages, tracker, latencies, active):
+    while active.is_set():
+        try:
+            item = messages.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        if item is None:
+            return
+        message, sent = item
+        tracker.evaluate_midi_event(decode(message))
+        if message[0][0] & 0xF0 == 0x90:
+            latencies.append(time.perf_counter() - sent)
+
+
+def run(mode, idle_seconds=3.0, notes=200):
+    tracker = MidiNoteTracker()
+    latencies = []
+    active = threading.Event()
+    active.set()
+    if mode == "poll":
+        messages = deque()
+        send = messages.append
+        consumer = threading.Thread(target=consume_poll, args=(messages, tracker, latencies, active))
+    else:
+        messages = queue.Queue()
+        send = messages.put
+        consumer = threading.Thread(target=consume_callback, args=(messages, tracker, latencies, active))
+    consumer.start()
+
+    # idle: no notes are played, only the consumer loop is running
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    time.sleep(idle_seconds)
+    idle_cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+    for i in range(notes):
+        note = 30 + i % 60
+        send((([0x90, note, 80], 0.0), time.perf_counter()))
+        time.sleep(0.01)
+        send((([0x80, note, 0], 0.0), time.perf_counter()))
+        time.sleep(0.01)
+    time.sleep(0.2)
+
+    active.clear()
+    if mode == "callback":
+        messages.put(None)
+    consumer.join()
+    tracker.shutdown()
+
+    latencies = sorted(latencies)
+    return {
+        "idle_cpu_percent": idle_cpu * 100,
+        "latency_p50_ms": statistics.median(latencies) * 1000,
+        "latency_p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    for mode in ("poll", "callback"):
+        result = run(mode)
+        print(f"{mode:9s} idle cpu {result['idle_cpu_percent']:6.1f} %   "
+              f"latency p50 {result['latency_p50_ms']:.3f} ms   p99 {result['latency_p99_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
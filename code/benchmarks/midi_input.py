@@ -0,0 +1,159 @@
+"""
+Idle CPU and note-to-tracker latency of the midi ingestion modes.
+
+Sends notes through an rtmidi virtual port (ALSA / CoreMIDI, not available on Windows)
+into MidiInput and compares the old busy-polling loop with the callback queue, then sends
+the same notes through several virtual ports at once into MultiMidiInput.
+
+Run from the code directory:
+    python -m benchmarks.midi_input
+"""
+import statistics
+import threading
+import time
+
+import rtmidi
+
+from midi.input import MidiInput, MultiMidiInput
+from midi.tracker import MidiNoteTracker
+
+PORT_NAME = "Ambient Light Benchmark"
+
+
+def find_port(name):
+    midiin = rtmidi.MidiIn()
+    for i, port_name in enumerate(midiin.get_ports()):
+        if name in port_name:
+            return i
+    raise RuntimeError(f"virtual port {name} not found")
+
+
+def consume(midi_input, mode, tracker, sent, latencies, active):
+    """
+    Consumer loop like MainLoop.main_loop
+    """
+    while active.is_set():
+        if mode == "poll":
+            m = midi_input.get_message()
+        else:
+            m = midi_input.get_message(timeout=0.5)
+        if m:
+            tracker.evaluate_midi_input(m)
+            if m[0][0] & 0xF0 == 0x90:
+                latencies.append(time.perf_counter() - sent[m[0][1]])
+
+
+def run(mode, idle_seconds=3.0, notes=200):
+    midiout = rtmidi.MidiOut()
+    midiout.open_virtual_port(PORT_NAME)
+    time.sleep(0.2)
+    midi_input = MidiInput(find_port(PORT_NAME), mode=mode)
+    tracker = MidiNoteTracker()
+
+    sent = {}
+    latencies = []
+    active = threading.Event()
+    active.set()
+    consumer = threading.Thread(target=consume, args=(midi_input, mode, tracker, sent, latencies, active))
+    consumer.start()
+
+    # idle: no notes are played, only the consumer loop is running
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    time.sleep(idle_seconds)
+    idle_cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+    for i in range(notes):
+        note = 30 + i % 60
+        sent[note] = time.perf_counter()
+        midiout.send_message([0x90, note, 80])
+        time.sleep(0.01)
+        midiout.send_message([0x80, note, 0])
+        time.sleep(0.01)
+    time.sleep(0.2)
+
+    active.clear()
+    midi_input.stop()
+    consumer.join()
+    tracker.shutdown()
+    midiout.close_port()
+
+    latencies = sorted(latencies)
+    return {
+        "idle_cpu_percent": idle_cpu * 100,
+        "latency_p50_ms": statistics.median(latencies) * 1000,
+        "latency_p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def run_merged(ports, notes=200):
+    """
+    Every port plays the notes at the same time from its own thread
+    :return: dict with messages per second and the note-to-consumer latency
+    """
+    outputs = []
+    for i in range(ports):
+        midiout = rtmidi.MidiOut()
+        midiout.open_virtual_port(f"{PORT_NAME} {i}")
+        outputs.append(midiout)
+    time.sleep(0.2)
+    midi_input = MultiMidiInput({i: find_port(f"{PORT_NAME} {i}") for i in range(ports)})
+
+    sent = {}
+    latencies = []
+    received = []
+
+    def consume():
+        while len(received) < 2 * notes * ports:
+            m = midi_input.get_message(timeout=1.0)
+            if m is None:
+                break
+            received.append(midi_input.last_arrival)
+            if m[0][0] & 0xF0 == 0x90:
+                latencies.append(time.perf_counter() - sent[(midi_input.last_source, m[0][1])])
+
+    def play(source, midiout):
+        for i in range(notes):
+            note = 30 + i % 60
+            sent[(source, note)] = time.perf_counter()
+            midiout.send_message([0x90, note, 80])
+            time.sleep(0.001)
+            midiout.send_message([0x80, note, 0])
+            time.sleep(0.001)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    start = time.perf_counter()
+    players = [threading.Thread(target=play, args=(i, midiout)) for i, midiout in enumerate(outputs)]
+    for player in players:
+        player.start()
+    for player in players:
+        player.join()
+    consumer.join()
+    seconds = time.perf_counter() - start
+    midi_input.stop()
+    for midiout in outputs:
+        midiout.close_port()
+
+    latencies = sorted(latencies)
+    return {
+        "messages_per_second": len(received) / seconds,
+        "ordered": received == sorted(received),
+        "latency_p50_ms": statistics.median(latencies) * 1000,
+        "latency_p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    for mode in ("poll", "callback"):
+        result = run(mode)
+        print(f"{mode:9s} idle cpu {result['idle_cpu_percent']:6.1f} %   "
+              f"latency p50 {result['latency_p50_ms']:.3f} ms   p99 {result['latency_p99_ms']:.3f} ms")
+    for ports in (1, 2, 4):
+        result = run_merged(ports)
+        print(f"{ports} merged ports {result['messages_per_second']:8.0f} messages/s   ordered {result['ordered']}   "
+              f"latency p50 {result['latency_p50_ms']:.3f} ms   p99 {result['latency_p99_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
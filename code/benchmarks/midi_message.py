@@ -0,0 +1,74 @@
+"""
+Decoding cost of MidiMessage against the integer decoder
+
+Run from the code directory:
+    python -m benchmarks.midi_message
+"""
+from benchmarks.common import measure, format_time
+from midi.message import MidiMessage, decode, decode_batch
+
+
+def trill(count):
+    """
+    Fast alternating note_on / note_off pairs on two keys
+    """
+    messages = []
+    for i in range(count // 2):
+        note = 60 + i % 2
+        messages.append(([0x90, note, 90], 0.02))
+        messages.append(([0x80, note, 0], 0.01))
+    return messages
+
+
+def pedal_storm(count):
+    """
+    Sustain pedal (continuous controller 64) moving up and down
+    """
+    return [([0xB0, 64, (i * 7) % 128], 0.003) for i in range(count)]
+
+
+def classify_midi_message(messages):
+    # main_loop and evaluate_midi_input each built a MidiMessage for the same message
+    for m in messages:
+        MidiMessage(m).get_midi_note_number()
+        message = MidiMessage(m)
+        if message.is_note_on():
+            message.get_midi_note_number(), message.get_midi_velocity()
+        elif message.is_note_off():
+            message.get_midi_note_number()
+        elif message.is_pedal_on():
+            pass
+        elif message.is_pedal_off():
+            pass
+
+
+def classify_decode(messages):
+    for m in messages:
+        event = decode(m)
+        event_type = event.type
+        if event_type == "note_on":
+            event.note, event.velocity
+        elif event_type == "note_off":
+            event.note
+
+
+def classify_decode_batch(messages):
+    for event in decode_batch(messages):
+        event_type = event.type
+        if event_type == "note_on":
+            event.note, event.velocity
+        elif event_type == "note_off":
+            event.note
+
+
+def main():
+    for name, messages in (("trill", trill(1000)), ("pedal storm", pedal_storm(1000))):
+        old = measure(lambda: classify_midi_message(messages), number=20) / len(messages)
+        new = measure(lambda: classify_decode(messages), number=20) / len(messages)
+        batch = measure(lambda: classify_decode_batch(messages), number=20) / len(messages)
+        print(f"{name:12s} MidiMessage {format_time(old)}   decode {format_time(new)}   "
+              f"decode_batch {format_time(batch)}   per message, {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Cost of one submit of the network controllers with a growing number of universes
+
+Sends to a udp socket on localhost that stands in for the nodes. After the timing one more frame is
+sent with different channels per universe, the receiver decodes its packets and checks the headers,
+the sequence number and the channels of every universe.
+
+Run from the code directory:
+    python -m benchmarks.network_output
+"""
+import socket
+
+from benchmarks.common import measure, format_time
+from lightning.network import ArtNetController, SACNController, parse_artnet, parse_sacn
+
+UNIVERSES = (1, 16, 64)
+NUMBER = 50
+
+
+def receive_all(receiver):
+    packets = []
+    while True:
+        try:
+            packets.append(receiver.recv(1024))
+        except BlockingIOError:
+            return packets
+
+
+def check_frame(controller, packets):
+    """
+    Decode the packets of one submit and compare them with the controller
+    :return: list of errors, empty if the frame arrived correctly
+    """
+    errors = []
+    if len(packets) != len(controller.universe_numbers):
+        errors.append(f"{len(packets)} packets for {len(controller.universe_numbers)} universes")
+    for packet in packets:
+        if isinstance(controller, ArtNetController):
+            decoded = parse_artnet(packet)
+            expected = {"version": 14}
+        else:
+            decoded = parse_sacn(packet)
+            # pdu lengths of root, framing and dmp layer with 512 channels
+            expected = {"lengths": (622, 600, 523), "priority": controller.priority,
+                        "source_name": controller.source_name, "cid": controller.cid, "start_code": 0}
+        if decoded is None:
+            errors.append("undecodable packet")
+            continue
+        expected["sequence"] = controller.sequence
+        for key, value in expected.items():
+            if decoded[key] != value:
+                errors.append(f"universe {decoded['universe']}: {key} {decoded[key]} instead of {value}")
+        if decoded["universe"] not in controller.universe_numbers:
+            errors.append(f"unexpected universe {decoded['universe']}")
+            continue
+        i = controller.universe_numbers.index(decoded["universe"])
+        if decoded["data"] != bytes(controller.channels[i * 512:(i + 1) * 512]):
+            errors.append(f"universe {decoded['universe']}: wrong channels")
+    return errors
+
+
+def main():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 24)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.setblocking(False)
+    port = receiver.getsockname()[1]
+    for name, controller_class in (("Art-Net", ArtNetController), ("sACN", SACNController)):
+        for universes in UNIVERSES:
+            controller = controller_class("127.0.0.1", universes=universes, first_universe=7, port=port)
+            controller.channels[:] = bytes(range(256)) * (2 * universes)
+            seconds = measure(controller.submit, number=NUMBER, repeat=3)
+            receive_all(receiver)
+            # channel values that differ per universe
+            controller.channels[:] = bytes((i // 512 * 7 + i) % 256 for i in range(512 * universes))
+            controller.submit()
+            errors = check_frame(controller, receive_all(receiver))
+            controller.close()
+            print(f"{name:8s} {universes:3d} universes   {format_time(seconds)} per frame   "
+                  f"{format_time(seconds / universes)} per universe   "
+                  + ("frame ok" if not errors else "ERRORS " + "; ".join(errors[:3])))
+    receiver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Pulse train scoring, the loop over dense pulse trains against score_pulse_trains
+
+Collects the enhanced autocorrelations and candidate peaks of a dataset file
+and scores them with both implementations.
+
+Run from the code directory:
+    python -m benchmarks.pulse_trains [file.mid ...]
+"""
+import sys
+import unittest.mock
+
+import numpy as np
+from scipy import signal
+
+from benchmarks.common import measure, format_time
+from benchmarks.tempo import DEFAULT_FILES, run
+from signal_evaluation import tempo
+
+
+def evaluate_pulse_trains_loop(corr, peaks, sampling_rate):
+    """
+    Previous implementation, one dense pulse train and full correlation per peak
+    """
+    highest_score = 0
+    estimated_tempo = 0
+    for peak in peaks:
+        combined_pulse_train = (tempo.create_pulse_train(peak, corr, 1, 1)
+                                + tempo.create_pulse_train(peak, corr, 1.5, 0.5)
+                                + tempo.create_pulse_train(peak, corr, 2, 0.5))
+        cross_corr = signal.correlate(corr, combined_pulse_train, mode='full')
+        score = np.max(cross_corr) + np.var(cross_corr)
+        if score > highest_score:
+            highest_score = score
+            estimated_tempo = int(60 * sampling_rate / peak)
+    return estimated_tempo, highest_score
+
+
+def collect_candidates(path):
+    """
+    :return: list of (enhanced autocorrelation, peaks) of all tempo updates
+    """
+    candidates = []
+    evaluate_pulse_trains = tempo.evaluate_pulse_trains
+
+    def collect(corr, peaks, sampling_rate):
+        candidates.append((corr.copy(), peaks.copy()))
+        return evaluate_pulse_trains(corr, peaks, sampling_rate)
+
+    with unittest.mock.patch.object(tempo, "evaluate_pulse_trains", collect):
+        run(path)
+    return candidates
+
+
+def main():
+    for path in sys.argv[1:] or DEFAULT_FILES:
+        candidates = collect_candidates(path)
+        mismatches = sum(evaluate_pulse_trains_loop(corr, peaks, 344)[0] != tempo.evaluate_pulse_trains(corr, peaks, 344)[0]
+                         for corr, peaks in candidates)
+
+        def loop():
+            for corr, peaks in candidates:
+                evaluate_pulse_trains_loop(corr, peaks, 344)
+
+        def batched():
+            for corr, peaks in candidates:
+                tempo.evaluate_pulse_trains(corr, peaks, 344)
+
+        old = measure(loop, number=1, repeat=3) / len(candidates)
+        new = measure(batched, number=1, repeat=3) / len(candidates)
+        print(f"{path}: {len(candidates)} updates, {mismatches} different tempos")
+        print(f"    per update   loop {format_time(old)}   score_pulse_trains {format_time(new)}   {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Synthetic note streams for the benchmarks
+
+Built like tests/generateMidi.py: chords on every beat, released after one beat,
+with an optional melody on a finer grid and seeded velocity variation so the mood
+and highlight estimation see realistic input.
+"""
+import numpy as np
+
+# name -> parameters of synthetic_stream
+DENSITIES = {
+    # pop piano, 3 note chords on the quarters and an eighth note melody, about 8 notes per second
+    "realistic": {"bpm": 120, "chord_size": 3, "chords_per_beat": 1, "melody_per_beat": 2},
+    # 4 note chords on the sixteenths at 180 bpm and a sixteenth melody, about 60 notes per second
+    "stress": {"bpm": 180, "chord_size": 4, "chords_per_beat": 4, "melody_per_beat": 4},
+}
+
+
+def synthetic_stream(bpm=120, seconds=60, chord_size=3, chords_per_beat=1, melody_per_beat=0, seed=0):
+    """
+    Generate a note stream
+    :param bpm: tempo
+    :param seconds: length of the stream
+    :param chord_size: notes per chord
+    :param chords_per_beat: chords per beat, each is released before the next one
+    :param melody_per_beat: melody notes per beat, 0 for none
+    :param seed: seed of the velocity and note variation
+    :return: list of (time in seconds, raw midi message) sorted by time, like midi.replay.read_midi_file
+    """
+    rng = np.random.default_rng(seed)
+    beat = 60 / bpm
+    events = []
+
+    chord_step = beat / chords_per_beat
+    roots = (48, 53, 55, 57)  # C F G A
+    for i in range(int(seconds / chord_step)):
+        onset = i * chord_step
+        root = roots[(i // (4 * chords_per_beat)) % len(roots)]
+        # major or minor triad with added seventh and octave for larger chords
+        intervals = (0, 4 if i % 3 else 3, 7, 11, 12)[:chord_size]
+        # accent on the one of every bar
+        velocity = 110 if i % (4 * chords_per_beat) == 0 else int(rng.integers(50, 80))
+        for interval in intervals:
+            events.append((onset, 1, [0x90, root + interval, velocity]))
+            events.append((onset + chord_step * 0.95, 0, [0x80, root + interval, 0]))
+
+    if melody_per_beat:
+        melody_step = beat / melody_per_beat
+        note = 72
+        for i in range(int(seconds / melody_step)):
+            onset = i * melody_step
+            note = int(np.clip(note + rng.integers(-3, 4), 64, 88))
+            events.append((onset, 1, [0x90, note, int(rng.integers(40, 100))]))
+            events.append((onset + melody_step * 0.9, 0, [0x80, note, 0]))
+
+    # note_off before note_on at the same time, as in a midi file
+    events.sort(key=lambda event: (event[0], event[1]))
+    return [(time, message) for time, _, message in events]
+
+
+def density_stream(density, seconds=60, seed=0):
+    """
+    :param density: key of DENSITIES
+    :param seconds:
+    :param seed:
+    :return: note stream, see synthetic_stream
+    """
+    return synthetic_stream(seconds=seconds, seed=seed, **DENSITIES[density])
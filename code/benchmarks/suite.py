@@ -0,0 +1,215 @@
+"""
+Benchmark suite of the analysis hot paths on synthetic note streams
+
+Every benchmark runs on the realistic and the stress density of benchmarks.streams. The tracker
+benchmarks replay 60 s of the stream first and then time single calls with the full history,
+like the manager threads see it during a live session.
+
+Run from the code directory:
+    python -m benchmarks.suite [--output results.json] [--compare old.json] [--only NAME ...]
+
+Save the results of one version with --output and pass them to --compare on the next one,
+benchmarks that got more than 20 % slower are marked.
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+from collections import Counter
+
+import numpy as np
+
+from benchmarks.common import measure, format_time
+from benchmarks.streams import DENSITIES, density_stream
+from midi.message import MidiMessage, decode
+from midi.note_buffer import NoteBuffer
+from midi.replay import VirtualClock
+from midi.tracker import MidiNoteTracker
+from signal_evaluation import tempo
+
+SECONDS = 60
+# slowdown factor that counts as regression in --compare
+REGRESSION = 1.2
+
+
+def last_chord_time(stream):
+    """
+    Time of the last chord onset, the tracker state is taken while this chord is held
+    """
+    onsets = Counter(time for time, message in stream if message[0] & 0xF0 == 0x90)
+    return max(time for time, count in onsets.items() if count > 1)
+
+
+def loaded_tracker(stream):
+    """
+    Replay the stream up to its last chord into a tracker without threads
+    :return: tracker with bpm, history and held chord
+    """
+    end = last_chord_time(stream)
+    clock = VirtualClock()
+    tracker = MidiNoteTracker(clock=clock, threaded=False)
+    next_tempo = tracker.tempo_interval
+    for time, message in stream:
+        if time > end:
+            break
+        while next_tempo <= time:
+            clock.now = next_tempo
+            tracker.update_tempo()
+            next_tempo += tracker.tempo_interval
+        clock.now = time
+        tracker.evaluate_midi_event(decode((message, 0.0)))
+    tracker.update_tempo()
+    return tracker
+
+
+def bench_decode_midi_message(stream):
+    messages = [(message, 0.0) for _, message in stream]
+
+    def run():
+        for message in messages:
+            MidiMessage(message).get_type()
+    return measure(run, number=5) / len(messages), "message"
+
+
+def bench_decode(stream):
+    messages = [(message, 0.0) for _, message in stream]
+
+    def run():
+        for message in messages:
+            decode(message)
+    return measure(run, number=5) / len(messages), "message"
+
+
+def bench_estimate_tempo(stream):
+    tracker = loaded_tracker(stream)
+    now = tracker.clock()
+    return measure(lambda: tempo.estimate_tempo(tracker.played_notes, now), number=50), "call"
+
+
+def bench_tempo_estimator(stream):
+    """
+    Streaming estimator, one update every tempo interval over the whole stream
+    """
+    onsets = [(message[1], time, message[2]) for time, message in stream if message[0] & 0xF0 == 0x90]
+    updates = np.arange(0.37, SECONDS, 0.37)
+
+    def run():
+        played_notes = NoteBuffer()
+        estimator = tempo.TempoEstimator()
+        i = 0
+        for now in updates:
+            while i < len(onsets) and onsets[i][1] <= now:
+                played_notes.append(*onsets[i])
+                i += 1
+            estimator.estimate(played_notes, now)
+    return measure(run, number=1, repeat=3) / len(updates), "update"
+
+
+def bench_estimate_mood(stream):
+    tracker = loaded_tracker(stream)
+    return measure(tracker.estimate_mood, number=200), "call"
+
+
+def bench_estimate_highlight(stream):
+    tracker = loaded_tracker(stream)
+    now = tracker.clock()
+    highlight_timings = tracker.highlight_timings
+
+    def run():
+        tracker.estimate_highlight(now)
+        # keep the series from growing over the runs
+        highlight_timings.clear()
+    return measure(run, number=1000), "call"
+
+
+def bench_get_played_chord(stream):
+    tracker = loaded_tracker(stream)
+    estimated_chords = tracker.estimated_chords
+
+    def run():
+        tracker.get_played_chord()
+        estimated_chords.clear()
+    return measure(run, number=1000), "call"
+
+
+BENCHMARKS = {
+    "MidiMessage": bench_decode_midi_message,
+    "decode": bench_decode,
+    "estimate_tempo": bench_estimate_tempo,
+    "TempoEstimator": bench_tempo_estimator,
+    "estimate_mood": bench_estimate_mood,
+    "estimate_highlight": bench_estimate_highlight,
+    "get_played_chord": bench_get_played_chord,
+}
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(names=None):
+    """
+    Run the benchmarks on all densities
+    :param names: benchmarks to run, defaults to all
+    :return: dict with the environment and the results
+    """
+    results = []
+    for density in DENSITIES:
+        stream = density_stream(density, SECONDS)
+        notes_per_second = sum(1 for _, message in stream if message[0] & 0xF0 == 0x90) / SECONDS
+        for name, benchmark in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            seconds, unit = benchmark(stream)
+            results.append({"benchmark": name, "density": density, "notes_per_second": notes_per_second,
+                            "seconds": seconds, "per": unit})
+    return {
+        "version": git_version(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def print_results(suite, baseline=None):
+    old = {}
+    if baseline is not None:
+        old = {(result["benchmark"], result["density"]): result["seconds"] for result in baseline["results"]}
+        print(f"compared to {baseline.get('version')} from {baseline.get('date')}")
+    for result in suite["results"]:
+        line = f"{result['benchmark']:20s} {result['density']:10s} {result['notes_per_second']:5.0f} notes/s " \
+               f"{format_time(result['seconds'])} per {result['per']}"
+        previous = old.get((result["benchmark"], result["density"]))
+        if previous:
+            ratio = result["seconds"] / previous
+            line += f"   {ratio:5.2f}x" + ("  REGRESSION" if ratio > REGRESSION else "")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="write the results to this json file")
+    parser.add_argument("--compare", help="json results of an earlier run to compare with")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="run only these benchmarks")
+    args = parser.parse_args()
+
+    suite = run_suite(args.only)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print_results(suite, baseline)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(suite, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
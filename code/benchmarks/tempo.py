@@ -0,0 +1,103 @@
+"""
+Cost of one tempo update, estimate_tempo against the streaming TempoEstimator
+
+Feeds the note onsets of a dataset file into a NoteBuffer and runs both estimators
+every 0.37 s of music, like the tempo manager thread does.
+The peak picking after the autocorrelation is the same for both, the time spent in it
+is also reported on its own.
+
+Run from the code directory:
+    python -m benchmarks.tempo [file.mid ...]
+"""
+import sys
+import time
+import unittest.mock
+
+import mido
+import numpy as np
+
+from benchmarks.common import format_time
+from midi.note_buffer import NoteBuffer
+from signal_evaluation import tempo
+
+DEFAULT_FILES = ["dataset/midifiles/piano/120bpm_chords_melody.mid", "tests/oceans.mid"]
+
+
+def note_onsets(path):
+    """
+    :return: list of (note, time, velocity) of all note_on messages
+    """
+    onsets = []
+    current = 0.0
+    for message in mido.MidiFile(path):
+        current += message.time
+        if message.type == "note_on":
+            onsets.append((message.note, current, message.velocity))
+    return onsets
+
+
+def run(path, interval=0.37):
+    onsets = note_onsets(path)
+    played_notes = NoteBuffer()
+    estimator = tempo.TempoEstimator()
+    clock = [0.0]
+    full_time = 0.0
+    streaming_time = 0.0
+    peak_picking_time = [0.0]
+    full_peak_picking = 0.0
+    streaming_peak_picking = 0.0
+    updates = 0
+    mismatches = 0
+    i = 0
+    tempo_from_autocorrelation = tempo.tempo_from_autocorrelation
+
+    def timed_peak_picking(*args):
+        start = time.perf_counter()
+        result = tempo_from_autocorrelation(*args)
+        peak_picking_time[0] += time.perf_counter() - start
+        return result
+
+    with unittest.mock.patch.object(tempo.time, "time", lambda: clock[0]), \
+            unittest.mock.patch.object(tempo, "tempo_from_autocorrelation", timed_peak_picking):
+        for now in np.arange(interval, onsets[-1][1] + interval, interval):
+            while i < len(onsets) and onsets[i][1] <= now:
+                played_notes.append(*onsets[i])
+                i += 1
+            clock[0] = now
+            peak_picking_time[0] = 0.0
+            start = time.perf_counter()
+            full = tempo.estimate_tempo(played_notes)
+            full_time += time.perf_counter() - start - peak_picking_time[0]
+            full_peak_picking += peak_picking_time[0]
+            peak_picking_time[0] = 0.0
+            start = time.perf_counter()
+            streaming = estimator.estimate(played_notes, now)
+            streaming_time += time.perf_counter() - start - peak_picking_time[0]
+            streaming_peak_picking += peak_picking_time[0]
+            updates += 1
+            mismatches += full != streaming
+    return {
+        "updates": updates,
+        "mismatches": mismatches,
+        # autocorrelation of the onset signal
+        "estimate_tempo": full_time / updates,
+        "TempoEstimator": streaming_time / updates,
+        # including peak picking
+        "estimate_tempo_total": (full_time + full_peak_picking) / updates,
+        "TempoEstimator_total": (streaming_time + streaming_peak_picking) / updates,
+    }
+
+
+def main():
+    for path in sys.argv[1:] or DEFAULT_FILES:
+        result = run(path)
+        print(f"{path}: {result['updates']} updates, {result['mismatches']} different tempos")
+        for stage, suffix in (("autocorrelation", ""), ("with peak picking", "_total")):
+            full = result["estimate_tempo" + suffix]
+            streaming = result["TempoEstimator" + suffix]
+            print(f"    {stage:18s} estimate_tempo {format_time(full)}   TempoEstimator {format_time(streaming)}"
+                  f"   {full / streaming:5.1f}x per update")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import json
+import threading
+from collections import deque
+
+import numpy as np
+
+# stages of a highlighted note from the midi port to the DMX controller
+STAGES = (
+    "input",  # message arrived at the port -> taken by the main loop
+    "tracker",  # note_on of the tracker, highlight estimation
+    "dispatch",  # highlight_set -> highlight keyframes scheduled by the universe
+    "render",  # keyframe due -> run by the render loop
+    "submit",  # keyframe written -> frame submitted
+    "total",  # message arrived -> frame submitted
+)
+
+
+class LatencyMonitor:
+    """
+    Rolling latency percentiles of the stages a note passes on its way to the lights
+
+    Every stage keeps the last `window` durations, the percentiles are computed when they are read.
+    record is called from the midi, tracker and render threads.
+    """
+
+    def __init__(self, window=2000, percentiles=(50, 95, 99)):
+        """
+        :param window: number of durations kept per stage
+        :param percentiles: percentiles of the stats
+        """
+        self.window = window
+        self.percentiles = percentiles
+        self.lock = threading.Lock()
+        self.samples = {stage: deque(maxlen=window) for stage in STAGES}
+        self.counts = dict.fromkeys(STAGES, 0)
+
+    def record(self, stage, seconds):
+        """
+        Add a duration
+        :param stage: stage name, new names are added after the known stages
+        :param seconds:
+        :return:
+        """
+        with self.lock:
+            if stage not in self.samples:
+                self.samples[stage] = deque(maxlen=self.window)
+                self.counts[stage] = 0
+            self.samples[stage].append(seconds)
+            self.counts[stage] += 1
+
+    def reset(self):
+        """
+        Remove all durations
+        :return:
+        """
+        with self.lock:
+            for stage in self.samples:
+                self.samples[stage].clear()
+                self.counts[stage] = 0
+
+    def stats(self):
+        """
+        Get the percentiles of all stages with durations
+        :return: dict stage -> dict with count (all time), p50, p95, p99 and max of the window in milliseconds
+        """
+        with self.lock:
+            samples = {stage: np.array(values) for stage, values in self.samples.items() if values}
+            counts = dict(self.counts)
+        stats = {}
+        for stage, values in samples.items():
+            values = values * 1000
+            stats[stage] = {"count": counts[stage]}
+            for q, value in zip(self.percentiles, np.percentile(values, self.percentiles)):
+                stats[stage][f"p{q}"] = float(value)
+            stats[stage]["max"] = float(np.max(values))
+        return stats
+
+    def report(self):
+        """
+        Format the stats as table
+        :return: string
+        """
+        stats = self.stats()
+        columns = [f"p{q}" for q in self.percentiles] + ["max"]
+        lines = [f"{'stage':10s} {'count':>7s} " + " ".join(f"{column:>8s}" for column in columns) + "   (ms)"]
+        for stage, values in stats.items():
+            lines.append(f"{stage:10s} {values['count']:7d} " + " ".join(f"{values[c]:8.2f}" for c in columns))
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        """
+        Print the stats and optionally write them to a json file
+        :param path: json file, None to only print
+        :return:
+        """
+        print(self.report())
+        if path is not None:
+            with open(path, "w") as file:
+                json.dump(self.stats(), file, indent=2)
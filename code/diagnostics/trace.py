@@ -0,0 +1,143 @@
+"""
+Opt-in tracing of the tracker and DMX threads in the Chrome trace event format
+
+Functions decorated with traced are recorded as complete events ("ph": "X") with their thread,
+the written json file can be opened in https://ui.perfetto.dev or chrome://tracing.
+While tracing is disabled the decorator only adds one global lookup per call.
+
+    trace.enable("trace.json")
+    ...
+    trace.disable()  # writes the file
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+_tracer = None
+
+
+class Tracer:
+    """
+    Collects the events of all threads until it is written
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: json file written by disable
+        """
+        self.path = path
+        self.start = time.perf_counter_ns()
+        self.pid = os.getpid()
+        # list.append is atomic, the threads add their events without a lock
+        self.events = []
+        self.thread_names = {}
+
+    def complete(self, name, category, start, end, args=None):
+        """
+        Add a span
+        :param name: name of the span
+        :param category: category shown in the viewer, e.g. "tracker" or "dmx"
+        :param start: perf_counter_ns at the start
+        :param end: perf_counter_ns at the end
+        :param args: dict shown with the span
+        :return:
+        """
+        tid = threading.get_ident()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        event = {"name": name, "cat": category, "ph": "X", "pid": self.pid, "tid": tid,
+                 "ts": (start - self.start) / 1000, "dur": (end - start) / 1000}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def instant(self, name, category, args=None):
+        """
+        Add an event without duration, e.g. a highlight trigger
+        :param name:
+        :param category:
+        :param args: dict shown with the event
+        :return:
+        """
+        tid = threading.get_ident()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        event = {"name": name, "cat": category, "ph": "i", "s": "t", "pid": self.pid, "tid": tid,
+                 "ts": (time.perf_counter_ns() - self.start) / 1000}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def write(self, path=None):
+        """
+        Write the events as Chrome trace json
+        :param path: json file, defaults to the path of the tracer
+        :return:
+        """
+        metadata = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in list(self.thread_names.items())]
+        with open(path or self.path, "w") as file:
+            json.dump({"traceEvents": metadata + list(self.events), "displayTimeUnit": "ms"}, file)
+
+
+def enable(path="trace.json"):
+    """
+    Start tracing
+    :param path: json file written by disable
+    :return: Tracer
+    """
+    global _tracer
+    _tracer = Tracer(path)
+    return _tracer
+
+
+def disable():
+    """
+    Stop tracing and write the trace file
+    :return: the stopped Tracer or None if tracing was not enabled
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None and tracer.path is not None:
+        tracer.write()
+        print(f"Trace with {len(tracer.events)} events written to {tracer.path}")
+    return tracer
+
+
+def is_enabled():
+    return _tracer is not None
+
+
+def instant(name, category, args=None):
+    """
+    Add an instant event if tracing is enabled
+    """
+    tracer = _tracer
+    if tracer is not None:
+        tracer.instant(name, category, args)
+
+
+def traced(category, name=None):
+    """
+    Decorator that records every call of the function as span while tracing is enabled
+    :param category: category shown in the viewer
+    :param name: name of the span, defaults to the function name
+    :return: decorator
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer.complete(span_name, category, start, time.perf_counter_ns())
+        return wrapper
+    return decorator
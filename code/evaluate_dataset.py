@@ -0,0 +1,127 @@
+"""
+Evaluate the tempo estimation on the dataset with offline replays in a process pool
+
+Run from the code directory:
+    python evaluate_dataset.py [files ...] [--workers N] [--csv results.csv]
+
+The reference tempo is taken from the file name, e.g. 85bpm_chords_melody.mid or chords-120.mid.
+"""
+import argparse
+import csv
+import glob
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from midi.replay import replay
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATTERNS = ["dataset/midifiles/**/*.mid", "tests/*.mid"]
+
+# relative tolerance of the accuracy measures, 4 % as in the MIREX tempo evaluation
+TOLERANCE = 0.04
+# factors that still count as correct for accuracy 2 (octave errors)
+OCTAVE_FACTORS = (1, 2, 3, 1 / 2, 1 / 3)
+
+
+def reference_tempo(path):
+    """
+    Get the tempo encoded in the file name
+    :param path:
+    :return: tempo in bpm or None
+    """
+    name = os.path.basename(path)
+    match = re.search(r"(\d+)\s*bpm", name, re.IGNORECASE) or re.search(r"-(\d+)\.mid$", name, re.IGNORECASE)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def evaluate_file(path):
+    """
+    Replay one file and compare its tempos to the reference tempo
+    :param path:
+    :return: dict with the results of the file
+    """
+    start = time.perf_counter()
+    result = replay(path)
+    wall_time = time.perf_counter() - start
+
+    tempos = np.array([bpm for _, bpm in result.tempos if bpm], dtype=float)
+    reference = reference_tempo(path)
+    row = {
+        "file": os.path.relpath(path, BASE_DIR),
+        "reference": reference,
+        "estimates": len(tempos),
+        "median": float(np.median(tempos)) if len(tempos) else None,
+        "abs_error": None,
+        "accuracy1": None,
+        "accuracy2": None,
+        "duration": result.duration,
+        "wall_time": wall_time,
+    }
+    if reference is not None and len(tempos):
+        relative_error = np.abs(tempos - reference) / reference
+        row["abs_error"] = float(np.mean(np.abs(tempos - reference)))
+        row["accuracy1"] = float(np.mean(relative_error <= TOLERANCE))
+        octave_error = np.min([np.abs(tempos - reference * factor) / (reference * factor)
+                               for factor in OCTAVE_FACTORS], axis=0)
+        row["accuracy2"] = float(np.mean(octave_error <= TOLERANCE))
+    return row
+
+
+def format_value(value, spec, width):
+    return f"{'-':>{width}s}" if value is None else format(value, f"{width}{spec}")
+
+
+def print_table(rows, total_wall_time):
+    header = f"{'file':48s} {'ref':>4s} {'n':>5s} {'median':>7s} {'|err|':>7s} {'acc1':>6s} {'acc2':>6s} " \
+             f"{'music':>7s} {'wall':>8s}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['file']:48s} {format_value(row['reference'], 'd', 4)} {row['estimates']:5d} "
+              f"{format_value(row['median'], '.1f', 7)} {format_value(row['abs_error'], '.2f', 7)} "
+              f"{format_value(row['accuracy1'], '.1%', 6)} {format_value(row['accuracy2'], '.1%', 6)} "
+              f"{row['duration']:6.1f}s {row['wall_time'] * 1000:6.0f}ms")
+    print("-" * len(header))
+
+    rated = [row for row in rows if row["accuracy1"] is not None]
+    music = sum(row["duration"] for row in rows)
+    cpu_time = sum(row["wall_time"] for row in rows)
+    if rated:
+        print(f"{len(rated)} files with reference tempo: "
+              f"mean |err| {np.mean([row['abs_error'] for row in rated]):.2f} bpm, "
+              f"accuracy1 {np.mean([row['accuracy1'] for row in rated]):.1%}, "
+              f"accuracy2 {np.mean([row['accuracy2'] for row in rated]):.1%}")
+    print(f"{len(rows)} files, {music:.0f} s of music, {cpu_time:.2f} s replay time, "
+          f"{total_wall_time:.2f} s wall time ({music / total_wall_time:.0f}x realtime)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="midi files, defaults to the dataset and test files")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, defaults to all cores")
+    parser.add_argument("--csv", help="write the per file results to this csv file")
+    args = parser.parse_args()
+
+    files = args.files or sorted(path for pattern in DEFAULT_PATTERNS
+                                 for path in glob.glob(os.path.join(BASE_DIR, pattern), recursive=True))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        rows = list(executor.map(evaluate_file, files))
+    total_wall_time = time.perf_counter() - start
+
+    print_table(rows, total_wall_time)
+    if args.csv:
+        with open(args.csv, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()), delimiter=";")
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
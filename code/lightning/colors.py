@@ -0,0 +1,106 @@
+"""
+Color conversions between RGB (0-255) and HSV (h 0-360, s 0-100, v 0-100)
+
+hsv_to_rgb uses a table of the unit colors (v = 1) of all integer hue and saturation values,
+the brightness is only a factor, so a conversion is one lookup and three multiplications.
+For integer inputs the results are identical to colorsys, fractional h and s are rounded.
+"""
+import colorsys
+import math
+from functools import lru_cache
+
+import numpy as np
+
+HUES = 361
+SATURATIONS = 101
+
+
+def _unit_table():
+    table = np.zeros((HUES, SATURATIONS, 3))
+    for h in range(HUES):
+        for s in range(SATURATIONS):
+            table[h, s] = colorsys.hsv_to_rgb(h / 360.0, s / 100.0, 1.0)
+    return table
+
+
+# unit colors of all (h, s), as array for the array api and as nested lists for the scalar api
+UNIT_TABLE = _unit_table()
+_UNIT_LIST = [[tuple(color) for color in row] for row in UNIT_TABLE.tolist()]
+
+
+def hsv_to_rgb(hsv):
+    """
+    Convert one HSV color to RGB
+    :param hsv: (h 0-360, s 0-100, v 0-100), s and v are clipped like in hsv_to_rgb_array
+    :return: (r, g, b) 0-255
+    """
+    h, s, v = hsv
+    s = math.floor(s + 0.5)
+    s = 0 if s < 0 else 100 if s > 100 else s
+    v = 0.0 if v < 0 else 1.0 if v > 100 else v / 100.0
+    # hue 360 is the same color as 0, like in colorsys
+    r, g, b = _UNIT_LIST[math.floor(h + 0.5) % 360][s]
+    return int(v * r * 255), int(v * g * 255), int(v * b * 255)
+
+
+def hsv_to_rgb_array(hsv):
+    """
+    Convert many HSV colors to RGB
+    :param hsv: array (n, 3) with h 0-360, s 0-100, v 0-100
+    :return: array (n, 3) of uint8 r, g, b
+    """
+    hsv = np.asarray(hsv, dtype=float)
+    h = np.floor(hsv[:, 0] + 0.5).astype(np.intp) % 360
+    s = np.clip(np.floor(hsv[:, 1] + 0.5), 0, SATURATIONS - 1).astype(np.intp)
+    v = np.clip(hsv[:, 2], 0, 100) / 100.0
+    return (v[:, None] * UNIT_TABLE[h, s] * 255).astype(np.uint8)
+
+
+@lru_cache(maxsize=4096)
+def _rgb_to_hsv(r, g, b):
+    h, s, v = colorsys.rgb_to_hsv(r / 255.0, g / 255.0, b / 255.0)
+    return int(h * 360), int(s * 100), int(v * 100)
+
+
+def rgb_to_hsv(rgb):
+    """
+    Convert one RGB color to HSV, the few colors of a show are cached
+    :param rgb: (r, g, b) 0-255
+    :return: (h 0-360, s 0-100, v 0-100)
+    """
+    return _rgb_to_hsv(int(rgb[0]), int(rgb[1]), int(rgb[2]))
+
+
+def rgb_to_hsv_array(rgb):
+    """
+    Convert many RGB colors to HSV, same formula as colorsys.rgb_to_hsv
+    :param rgb: array (n, 3) with r, g, b 0-255
+    :return: int array (n, 3) with h 0-360, s 0-100, v 0-100
+    """
+    rgb = np.asarray(rgb, dtype=float) / 255.0
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc = rgb.max(axis=1)
+    rangec = maxc - rgb.min(axis=1)
+    gray = rangec == 0
+    # avoid the division by zero for gray colors, their h and s are 0
+    safe_range = np.where(gray, 1.0, rangec)
+    s = np.where(gray, 0.0, rangec / np.where(maxc == 0, 1.0, maxc))
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0.0, (h / 6.0) % 1.0)
+    return np.stack(((h * 360).astype(int), (s * 100).astype(int), (maxc * 100).astype(int)), axis=1)
+
+
+def rgb_to_hex(rgb):
+    return '#%02x%02x%02x' % tuple(rgb)
+
+
+def hsv_to_hex(hsv):
+    return rgb_to_hex(hsv_to_rgb(hsv))
+
+
+def hex_to_rgb(hex_color):
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
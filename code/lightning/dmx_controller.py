@@ -1,70 +1,118 @@
 import platform
 import time
 import threading
-import colorsys
+import numpy as np
 from DMXEnttecPro import Controller
-
-
-def rgb_to_hsv(rgb):
-    # RGB-Werte skalieren
-    r, g, b = rgb[0] / 255.0, rgb[1] / 255.0, rgb[2] / 255.0
-    # Konvertierung von RGB zu HSV
-    h, s, v = colorsys.rgb_to_hsv(r, g, b)
-    # HSV-Werte skalieren und auf den richtigen Bereich setzen
-    h = int(h * 360)
-    s = int(s * 100)
-    v = int(v * 100)
-    return (h, s, v)
-
-
-def hsv_to_rgb(hsv):
-    # HSV-Werte skalieren und auf den richtigen Bereich setzen
-    h, s, v = hsv[0] / 360.0, hsv[1] / 100.0, hsv[2] / 100.0
-    # Konvertierung von HSV zu RGB
-    r, g, b = colorsys.hsv_to_rgb(h, s, v)
-    # RGB-Werte skalieren und auf den richtigen Bereich setzen
-    r = int(r * 255)
-    g = int(g * 255)
-    b = int(b * 255)
-    return (r, g, b)
+from diagnostics import trace
+from diagnostics.trace import traced
+from lightning.colors import hsv_to_rgb, rgb_to_hsv
+from lightning.fade import FadeEngine
+from lightning.output import OutputWorker
+from lightning.scheduler import Scheduler
 
 
 class DMXUniverse:
     # TODO automatisch nach controller suchen
-    def __init__(self, midiTracker, port='/dev/ttyUSB0'):
-        if platform.system() == "Windows":
+    def __init__(self, midiTracker, port='/dev/ttyUSB0', frame_rate=44, refresh_interval=1.0, output_latency=0.0,
+                 latency=None, controller_factory=None):
+        """
+        :param midiTracker: MidiNoteTracker to follow
+        :param port: serial port of the Enttec DMX USB Pro, or a list of ports, one controller each
+        :param frame_rate: frames per second of the render loop, 44 is the maximum of DMX512
+        :param refresh_interval: seconds after which an unchanged frame is sent again
+        :param output_latency: seconds from the submit until the fixtures show the color,
+                               beat aligned changes are scheduled this much earlier
+        :param latency: LatencyMonitor for the stages of highlighted notes, defaults to the one of the tracker
+        :param controller_factory: function(port) -> controller with channels, submit() and close(),
+                                   defaults to the Enttec Controller, LoopbackController for a dry run,
+                                   ArtNetController or SACNController for network nodes. A controller
+                                   with n * 512 channels drives the next n universes
+        """
+        if platform.system() == "Windows" and port == '/dev/ttyUSB0':
             port = 'COM4'
+        ports = port if isinstance(port, (list, tuple)) else [port]
+        self.latency = latency if latency is not None else midiTracker.latency
+        if controller_factory is None:
+            controller_factory = Controller
+        controllers = []
         try:
-            self.dmx = Controller(port)
+            for p in ports:
+                controllers.append(controller_factory(p))
         except:
             print("No DMX device found")
+            # release the ports that could be opened
+            for controller in controllers:
+                controller.close()
             return
+        # one submit thread per controller, a stalled interface does not hold up the others
+        self.outputs = [OutputWorker(controller, f"DMX Output {i}", self.latency)
+                        for i, controller in enumerate(controllers)]
+        # channel range of the frame each output sends
+        self.output_ranges = []
+        start = 0
+        for controller in controllers:
+            self.output_ranges.append((start, start + len(controller.channels)))
+            start += len(controller.channels)
+        self.universes = start // 512
         self.devices = {}
         self.midiTracker = midiTracker
         self.active = True
 
+        # one frame with the 512 channels of every universe, composed by the render loop and handed
+        # to all outputs in the same tick, so the universes stay in lockstep
+        self.frame = bytearray(512 * self.universes)
+        self.frame_view = np.frombuffer(self.frame, dtype=np.uint8)
+        self.frame_rate = frame_rate
+        # fade state of all devices
+        self.fades = FadeEngine()
+        # timed actions like highlight keyframes, run by the render loop
+        self.scheduler = Scheduler()
+        # last transmitted frame and the channel range written since, unchanged universes are not submitted
+        self.sent_frame = bytearray(len(self.frame))
+        self.dirty_start = len(self.frame)
+        self.dirty_end = 0
+        self.refresh_interval = refresh_interval
+        self.last_submit = [0] * len(self.outputs)
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.output_latency = output_latency
+        # arrival times of highlighted notes written into the frame but not submitted yet
+        self.pending_notes = []
+        # incremented by every highlight, the latency mark of a superseded highlight is dropped
+        self.highlight_generation = 0
+        self.render_thread = threading.Thread(target=self.render_loop, name="DMX Render")
+        self.render_thread.start()
+
         self.highlight_thread = threading.Thread(target=self.set_highlight_color, name="Highlight Thread")
         self.highlight_thread.start()
 
         self.mood_thread = threading.Thread(target=self.set_mood_colors, name="Mood Thread")
         self.mood_thread.start()
 
-    def add_device(self, device_id, start_channel, mode="normal"):
+    def add_device(self, device_id, start_channel, mode="normal", universe=0):
         """
         Add a device to the universe
         :param device_id:
         :param start_channel:
         :param mode:
-        :return: True if device was added, False if device already exists
-        """
+        :param universe: number of the universe (controller) of the device
+        :return: True if device was added, False if device already exists, its three channels do not fit
+                 into the universe or the universe does not exist
+        """
+        # the three channels must fit into the universe, 511 and 512 would spill into the next one
+        if not 1 <= start_channel <= 510:
+            return False
+        if not 0 <= universe < self.universes:
+            return False
         for device in self.devices.values():
-            if device.start_channel == start_channel:
+            if device.start_channel == start_channel and device.universe == universe:
                 return False
             if device_id == device.id:
                 return False
-        device = DMXDevice(device_id, start_channel, mode, self.dmx)
-        # device.set_dmx(self.dmx)
+        device = DMXDevice(device_id, start_channel, mode, self.fades, self.scheduler, universe=universe)
         self.devices[device_id] = device
+        # start after adding, the render loop has to see the start fade
+        device.start()
         return True
 
     def remove_device(self, device_id):
@@ -73,9 +121,12 @@ class DMXUniverse:
         :param device_id:
         :return:
         """
-        self.devices[device_id].set_rgb(0, 0, 0)
-        self.devices[device_id].shutdown()
-        del self.devices[device_id]
+        device = self.devices.pop(device_id)
+        device.set_rgb(0, 0, 0)
+        device.shutdown()
+        # write the black color before the slot is released, the render loop does not see it afterwards
+        self.write_frame()
+        self.fades.remove(device.slot)
 
     def get_device_mode(self, device_id):
         """
@@ -93,12 +144,146 @@ class DMXUniverse:
         self.active = False
         self.midiTracker.highlight_set.set()
         self.midiTracker.mood_set.set()
+        self.render_thread.join()
+        self.scheduler.clear()
         for device in self.devices.values():
             device.set_rgb(0, 0, 0)
             device.shutdown()
+        self.write_frame()
+        self.submit_frame(force=True)
+        print(f"DMX frames sent: {self.frames_sent}, skipped: {self.frames_skipped}")
+        for i, output in enumerate(self.outputs):
+            # submits the black frame before the controller is closed
+            output.close()
+            print(f"DMX output {i}: frames submitted: {output.frames_sent}, dropped: {output.frames_dropped}")
         time.sleep(0.5)
         self.midiTracker.shutdown()
-        self.dmx.close()
+
+    def write_frame(self):
+        """
+        Write the current colors of all devices into the frame
+        :return:
+        """
+        dirty = self.fades.write(self.frame_view)
+        if dirty is not None:
+            self.dirty_start = min(self.dirty_start, dirty[0])
+            self.dirty_end = max(self.dirty_end, dirty[1])
+
+    @traced("dmx", "dmx submit")
+    def submit_frame(self, force=False):
+        """
+        Hand the outputs whose universes differ from their last transmitted frame the new frame
+        :param force: send all universes even if nothing changed
+        :return: True if at least one output got the frame
+        """
+        now = time.time()
+        notes = self.pending_notes
+        self.pending_notes = []
+        sent = False
+        for i, (output, (start, end)) in enumerate(zip(self.outputs, self.output_ranges)):
+            dirty_start = max(self.dirty_start, start)
+            dirty_end = min(self.dirty_end, end)
+            changed = dirty_start < dirty_end and \
+                self.frame[dirty_start:dirty_end] != self.sent_frame[dirty_start:dirty_end]
+            if not (changed or force or now - self.last_submit[i] >= self.refresh_interval):
+                continue
+            # the latency of the notes is measured until the first output of the frame has submitted it
+            output.submit(self.frame[start:end], notes if not sent else None)
+            self.sent_frame[start:end] = self.frame[start:end]
+            self.last_submit[i] = now
+            sent = True
+        self.dirty_start = len(self.frame)
+        self.dirty_end = 0
+        if not sent:
+            self.frames_skipped += 1
+            # the fixtures already show this frame
+            self.record_pending_notes(notes, now)
+            return False
+        self.frames_sent += 1
+        return True
+
+    def record_pending_notes(self, notes, submitted):
+        """
+        Record the submit and total latency of highlighted notes
+        :param notes: list of (received, written)
+        :param submitted: time the frame was submitted
+        :return:
+        """
+        for received, written in notes:
+            self.latency.record("submit", submitted - written)
+            self.latency.record("total", submitted - received)
+
+    @property
+    def submit_duration(self):
+        """
+        Measured duration of a submit of the slowest output, moving average
+        :return: seconds
+        """
+        return max(output.submit_duration for output in self.outputs)
+
+    def mark_highlight(self, generation, received, scheduled):
+        """
+        Scheduled after the first keyframe of a highlight, measures the render stage of the note
+        Skipped if a newer highlight replaced the keyframes, the note is never shown
+        :param generation: highlight_generation at the time the keyframes were scheduled
+        :param received: time.time() the note arrived
+        :param scheduled: time the keyframe was due
+        :return:
+        """
+        if generation != self.highlight_generation:
+            return
+        written = time.time()
+        self.latency.record("render", written - scheduled)
+        self.pending_notes.append((received, written))
+
+    def get_output_lead(self):
+        """
+        Time between scheduling a change and the fixtures showing it:
+        on average half a frame until the render loop runs it, the submit and the fixture latency
+        :return: seconds
+        """
+        return 0.5 / self.frame_rate + self.submit_duration + self.output_latency
+
+    def get_next_beats(self, count, after, subdivision=1):
+        """
+        Predicted beats of the tracker, moved earlier by the output lead so the changes are visible on the beat
+        :param count: number of beats
+        :param after: earliest time a change may be scheduled
+        :param subdivision: grid points per beat
+        :return: list of timestamps to schedule the changes at, empty if no beat is predicted
+        """
+        lead = self.get_output_lead()
+        return [beat - lead for beat in self.midiTracker.get_next_beats(count, after + lead, subdivision)]
+
+    def get_frame_stats(self):
+        """
+        Get the number of sent and skipped frames
+        :return: tuple (frames_sent, frames_skipped)
+        """
+        return self.frames_sent, self.frames_skipped
+
+    def render_loop(self):
+        """
+        Thread that runs the due scheduled actions, advances the fades of all devices,
+        composes the frame and submits it once per tick
+        :return:
+        """
+        frame_time = 1 / self.frame_rate
+        next_frame = time.time()
+        while self.active:
+            now = time.time()
+            self.scheduler.run(now)
+            self.fades.advance(now, frame_time)
+            self.write_frame()
+            self.submit_frame()
+
+            next_frame += frame_time
+            delay = next_frame - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # too slow, skip the missed frames instead of catching up
+                next_frame = time.time()
 
     def update_device_colors(self, device_id, highlight_rgb, low_rgb, high_rgb):
         """
@@ -122,6 +307,14 @@ class DMXUniverse:
             self.midiTracker.mood_set.clear()
             self.midiTracker.mood_set.wait()
             if self.active:
+                # the fade takes about 0.4 seconds and ends on a beat, if one is predicted
+                now = time.time()
+                beats = self.get_next_beats(1, now + 0.2)
+                fade_time = beats[0] - now if beats else 0.4
+                if fade_time > self.midiTracker.mood_interval:
+                    # at slow tempos the next mood would restart the fade before it reaches the beat
+                    fade_time = 0.4
+                trace.instant("mood", "dmx", {"fade_time": fade_time})
                 # listen to tracker and set color based on mood value changes
                 for device in self.devices.values():
                     if device.mode == "normal":
@@ -134,7 +327,8 @@ class DMXUniverse:
                         # h = (hsv2[0]-hsv1[0]) / 2 * mood[0] + (hsv2[0]+hsv1[0]) / 2
                         # s = (hsv2[1]-hsv1[1]) / 2 * mood[0] + (hsv2[1]+hsv1[1]) / 2
                         # v = 45 * mood[1] + 50
-                        device.set_rgb_time(*hsv_to_rgb((h, s, v)), 0.4)
+                        # same start for all devices, their fades end in the same frame
+                        device.set_rgb_time(*hsv_to_rgb((h, s, v)), fade_time, now)
 
     def set_highlight_color(self):
         """
@@ -146,53 +340,56 @@ class DMXUniverse:
             self.midiTracker.highlight_set.clear()
             self.midiTracker.highlight_set.wait()
             if self.active:
+                bpm = self.midiTracker.get_bpm()
+                if not bpm:
+                    continue
+                now = time.time()
+                # the flash reacts to the note, the rest of the pattern follows the eighth note grid
+                eighth = (60 / bpm) / 2
+                grid = self.get_next_beats(3, now + eighth / 2, subdivision=2) or None
+                trace.instant("highlight", "dmx", {"bpm": bpm})
+                highlighted = False
+                self.highlight_generation += 1
                 for device in self.devices.values():
                     if device.mode == "highlight":
-                        # if not device.highlight_thread.is_alive():
-                        #     device.highlight_thread.start()
-                        if self.midiTracker.get_bpm() is None:
-                            break
-                        device.current_bpm = self.midiTracker.get_bpm()
-                        device.new_highlight_event.set()
+                        device.highlight(bpm, now, grid)
+                        highlighted = True
+                stamp = self.midiTracker.highlight_stamp
+                if highlighted and self.latency is not None and stamp is not None:
+                    received, signalled = stamp
+                    self.latency.record("dispatch", now - signalled)
+                    # runs in the same frame as the flash keyframes, they were scheduled first
+                    self.scheduler.at(now, self.mark_highlight, self.highlight_generation, received, now)
 
 
 class DMXDevice:
-    def __init__(self, id, start_channel, mode, dmx, r=0, g=0, b=0):
-        self.dmx = dmx
+    def __init__(self, id, start_channel, mode, fades, scheduler, r=0, g=0, b=0, universe=0):
         self.id = id
         self.start_channel = start_channel  # Start DMX channel of the device
-        self.r = r  # current color
-        self.g = g  # current color
-        self.b = b  # current color
+        self.universe = universe
 
         # ColorManager
+        # current color, target color and fade time are kept in the FadeEngine of the universe
+        self.fades = fades
+        self.scheduler = scheduler
+        self.slot = fades.add(start_channel, universe)
+        self.set_rgb(r, g, b)
         self.mode = mode
-        self.hsv = (0, 0, 0)  # current color
-        self.hsv_target = (0, 0, 0)  # target color
-        self.target_time = 0
         self.active = True
         self.mood_value = (0, 0)
 
-        self.device_active = threading.Thread(target=self.color_thread, name=f"Device {id}")
-        self.new_color_event = threading.Event()  # Event to signal a new color was set - for fading
-        self.step_time = 0.005
-
-        self.highlight_thread = threading.Thread(target=self.highlight_thread, name=f"Highlight {id}")
-        self.new_highlight_event = threading.Event()
-        self.current_bpm = None
+        # incremented by every highlight, keyframes of an older highlight are dropped
+        self.highlight_generation = 0
 
         self.highlight_hsv = (0, 0, 100)  # HSV
         self.color_low_hsv = (0, 100, 50)  # HSV
         self.color_high_hsv = (60, 100, 100)  # HSV
 
-        self.start()
-
     def start(self):
         """
         Start the device
         :return:
         """
-        self.device_active.start()
         if self.mode == "normal":
             h = (self.color_high_hsv[0] + self.color_low_hsv[0]) / 2
             s = (self.color_high_hsv[1] + self.color_low_hsv[1]) / 2
@@ -200,46 +397,45 @@ class DMXDevice:
             self.hsv = (h, 0, 0)
             self.set_rgb_time(*hsv_to_rgb((h, s, v)), 1)
         elif self.mode == "highlight":
+            now = time.time()
             self.set_rgb_time(*hsv_to_rgb(self.color_low_hsv), 0.5)
-            time.sleep(0.5)
-            self.set_rgb_time(0, 0, 0, 0.5)
-            self.highlight_thread.start()
+            self.scheduler.at(now + 0.5, self.keyframe, self.highlight_generation, (0, 0, 0), 0.5)
 
     def shutdown(self):
         """
-        Shutdown the device
+        Shutdown the device, pending keyframes are dropped
         :return:
         """
         self.active = False
-        self.new_color_event.set()
-        self.new_highlight_event.set()
-        if self.device_active:
-            self.device_active.join()
 
-    def highlight_thread(self):
+    def highlight(self, bpm, now, grid=None):
         """
-        Thread that highlights the device if the event is set by the Universe
+        Schedule the highlight pattern: flash, black, flash with 66 % brightness, black, one eighth note each
+        A new highlight replaces the rest of a running one
+        :param bpm: current tempo
+        :param now: start time of the pattern
+        :param grid: times of the three keyframes after the first flash, defaults to eighth notes from now
         :return:
         """
-        print("Highlight Thread started")
-        while self.active:
-            self.new_highlight_event.wait()
-            if not self.active:
-                break
-            if self.current_bpm is None or self.current_bpm == 0:
-                self.new_highlight_event.clear()
-                continue
-            sleeptime = (60 / self.current_bpm) / 2  # achtelnote zeit
-            self.set_rgb_time(*hsv_to_rgb(self.highlight_hsv),0)
-            time.sleep(sleeptime)
-            self.set_rgb_time(0, 0, 0, 0)
-            time.sleep(sleeptime)
-            second_hsv = (self.highlight_hsv[0], self.highlight_hsv[1], self.highlight_hsv[2] * 0.66)
-            self.set_rgb_time(*hsv_to_rgb(second_hsv), 0)
-            time.sleep(sleeptime)
-            self.set_rgb_time(0, 0, 0, 0)
-            time.sleep(sleeptime)
-            self.new_highlight_event.clear()
+        self.highlight_generation += 1
+        eighth = (60 / bpm) / 2  # achtelnote zeit
+        if grid is None:
+            grid = [now + i * eighth for i in range(1, 4)]
+        second_hsv = (self.highlight_hsv[0], self.highlight_hsv[1], self.highlight_hsv[2] * 0.66)
+        pattern = (hsv_to_rgb(self.highlight_hsv), (0, 0, 0), hsv_to_rgb(second_hsv), (0, 0, 0))
+        for when, rgb in zip([now] + list(grid), pattern):
+            self.scheduler.at(when, self.keyframe, self.highlight_generation, rgb)
+
+    def keyframe(self, generation, rgb, t_time=0.0):
+        """
+        Scheduled color change, skipped if the device was shut down or a newer highlight started
+        :param generation: highlight_generation at the time the keyframe was scheduled
+        :param rgb:
+        :param t_time: fade time
+        :return:
+        """
+        if self.active and generation == self.highlight_generation:
+            self.set_rgb_time(*rgb, t_time)
 
     def set_highlight_color(self, h, s, v):
         """
@@ -256,24 +452,32 @@ class DMXDevice:
         self.color_low_hsv = low
         self.color_high_hsv = high
 
-    def set_color(self):
+    @property
+    def hsv(self):
         """
-        Sets the color of the device to the current hsv value
-        :return: void
+        Current color
+        :return: hsv tuple
         """
-        self.dmx.set_channel(self.start_channel, self.r)
-        self.dmx.set_channel(self.start_channel + 1, self.g)
-        self.dmx.set_channel(self.start_channel + 2, self.b)
-        self.dmx.submit()  # Sends the update to the controller
+        return tuple(self.fades.hsv[self.slot])
+
+    @hsv.setter
+    def hsv(self, hsv):
+        self.fades.hsv[self.slot] = hsv
+
+    @property
+    def rgb(self):
+        """
+        Current color as sent to the device
+        :return: rgb tuple
+        """
+        return tuple(int(c) for c in self.fades.rgb[self.slot])
 
     def set_rgb(self, r, g, b):
         """
-        Set the RGB color of the device.
+        Set the RGB color of the device, the universe sends it with the next frame
+        Stops a running fade
         """
-        self.r = r
-        self.g = g
-        self.b = b
-        threading.Thread(target=self.set_color, name="Setting Color").start()
+        self.fades.set_color(self.slot, rgb_to_hsv((r, g, b)), (r, g, b))
 
     def get_mood_colors(self):
         """
@@ -289,37 +493,11 @@ class DMXDevice:
         """
         return self.highlight_hsv
 
-    def color_thread(self):
-        """
-        Thread to fade the color of the device
-        :return:
-        """
-        while self.active:
-            self.new_color_event.clear()
-            self.new_color_event.wait()
-            # solange die farbe nicht stimmt, wird sie angepasst
-            while self.active and not self.hsv == self.hsv_target:
-                # calculate color step based on target time and color difference
-                h_diff = self.hsv_target[0] - self.hsv[0]
-                s_diff = self.hsv_target[1] - self.hsv[1]
-                v_diff = self.hsv_target[2] - self.hsv[2]
-                t_diff = max(self.target_time - time.time(), 0)
-                if t_diff <= 0.005:
-                    self.hsv = self.hsv_target
-                    self.set_rgb(*hsv_to_rgb(self.hsv))
-                    break
-                steps = t_diff / self.step_time
-                h_step = h_diff / steps
-                s_step = s_diff / steps
-                v_step = v_diff / steps
-                self.hsv = (self.hsv[0] + h_step, self.hsv[1] + s_step, self.hsv[2] + v_step)
-                self.set_rgb(*hsv_to_rgb(self.hsv))
-                time.sleep(self.step_time)
-
-    def set_rgb_time(self, r, g, b, t_time=0.0):
+    def set_rgb_time(self, r, g, b, t_time=0.0, start=None):
         """
         Set the RGB color of the device with a fade time
+        :param start: time the fade starts, defaults to now
         """
-        self.hsv_target = rgb_to_hsv((r, g, b))
-        self.target_time = time.time() + t_time
-        self.new_color_event.set()
+        if start is None:
+            start = time.time()
+        self.fades.set_target(self.slot, rgb_to_hsv((r, g, b)), start + t_time)
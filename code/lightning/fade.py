@@ -0,0 +1,135 @@
+import threading
+
+import numpy as np
+
+from diagnostics.trace import traced
+from lightning.colors import hsv_to_rgb_array
+
+
+class FadeEngine:
+    """
+    Fade state of all fixtures of all universes in numpy arrays
+
+    Every fixture owns one slot (row) with its current HSV color, target HSV color and the time
+    the target has to be reached. advance moves all running fades by one frame in one step
+    and write puts the RGB colors of all fixtures into the DMX frame.
+    """
+
+    def __init__(self, capacity=170):
+        """
+        :param capacity: number of slots to allocate, 170 RGB fixtures fill a universe, grows if needed
+        """
+        self.lock = threading.Lock()
+        self.hsv = np.zeros((capacity, 3))
+        self.hsv_target = np.zeros((capacity, 3))
+        self.target_time = np.zeros(capacity)
+        self.rgb = np.zeros((capacity, 3), dtype=np.uint8)
+        # first channel of the fixture, 0-based, universe n starts at channel n * 512
+        self.channels = np.zeros(capacity, dtype=int)
+        self.used = np.zeros(capacity, dtype=bool)
+
+    def add(self, start_channel, universe=0):
+        """
+        Reserve a slot for a fixture
+        :param start_channel: first DMX channel of the fixture, 1-510, the fixture uses three channels
+        :param universe: number of the universe of the fixture
+        :return: slot number
+        """
+        if not 1 <= start_channel <= 510:
+            # write would fail in the render thread
+            raise ValueError(f"start channel {start_channel} is not in 1-510")
+        with self.lock:
+            free = np.flatnonzero(~self.used)
+            if len(free) == 0:
+                self._grow()
+                free = np.flatnonzero(~self.used)
+            slot = int(free[0])
+            self.used[slot] = True
+            self.channels[slot] = universe * 512 + start_channel - 1
+            self.hsv[slot] = self.hsv_target[slot] = 0
+            self.target_time[slot] = 0
+            self.rgb[slot] = 0
+            return slot
+
+    def remove(self, slot):
+        """
+        Release the slot of a fixture
+        :param slot:
+        :return:
+        """
+        with self.lock:
+            self.used[slot] = False
+
+    def _grow(self):
+        capacity = 2 * len(self.used)
+        for name in ("hsv", "hsv_target", "target_time", "rgb", "channels", "used"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def set_target(self, slot, hsv, target_time):
+        """
+        Start a fade of one fixture
+        :param slot:
+        :param hsv: target color
+        :param target_time: time the target color has to be reached
+        :return:
+        """
+        with self.lock:
+            self.hsv_target[slot] = hsv
+            self.target_time[slot] = target_time
+
+    def set_color(self, slot, hsv, rgb):
+        """
+        Set the color of one fixture immediately and stop its fade
+        :param slot:
+        :param hsv:
+        :param rgb:
+        :return:
+        """
+        with self.lock:
+            self.hsv[slot] = self.hsv_target[slot] = hsv
+            self.rgb[slot] = rgb
+
+    @traced("dmx", "fade step")
+    def advance(self, now, frame_time):
+        """
+        Advance all running fades by one frame
+        Each fade moves by the fraction frame_time / remaining time of the distance to its target,
+        fades with less than one frame left jump to the target
+        :param now: time of the frame
+        :param frame_time: time between two frames
+        :return: number of fixtures that changed
+        """
+        with self.lock:
+            fading = self.used & np.any(self.hsv != self.hsv_target, axis=1)
+            if not np.any(fading):
+                return 0
+            remaining = np.maximum(self.target_time[fading] - now, 0)
+            hsv = self.hsv[fading]
+            target = self.hsv_target[fading]
+            finished = remaining <= frame_time
+            fraction = np.where(finished, 1.0, frame_time / np.maximum(remaining, frame_time))
+            hsv += (target - hsv) * fraction[:, None]
+            hsv[finished] = target[finished]
+            self.hsv[fading] = hsv
+            self.rgb[fading] = hsv_to_rgb_array(hsv)
+            return int(np.count_nonzero(fading))
+
+    @traced("dmx", "fade write")
+    def write(self, frame):
+        """
+        Write the RGB colors of all fixtures into the frame
+        :param frame: writable uint8 array with the 512 channels of every universe
+        :return: (start, end) of the changed channels or None
+        """
+        with self.lock:
+            channels = self.channels[self.used][:, None] + np.arange(3)
+            rgb = self.rgb[self.used]
+        changed = np.any(frame[channels] != rgb, axis=1)
+        if not np.any(changed):
+            return None
+        channels = channels[changed]
+        frame[channels] = rgb[changed]
+        return int(channels.min()), int(channels.max()) + 1
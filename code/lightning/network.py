@@ -0,0 +1,195 @@
+"""
+Art-Net and sACN (E1.31) output over UDP
+
+The controllers have the interface of the DMXEnttecPro Controller (channels, submit(), close()), but one
+controller can drive several consecutive universes of a node: channels holds 512 channels per universe and
+submit sends one packet per universe in a batch. Every universe has its own connected socket and a packet
+buffer with the prebuilt header, a submit only patches the sequence number and copies the channels.
+"""
+import socket
+import struct
+import uuid
+
+ARTNET_PORT = 6454
+SACN_PORT = 5568
+
+
+def source_name_bytes(name):
+    """
+    :param name: source name of sACN
+    :return: utf-8 name of at most 63 bytes, without a cut character, the packet pads it with zeros to 64
+    """
+    return name.encode()[:63].decode(errors="ignore").encode()
+
+
+def parse_artnet(packet):
+    """
+    Decode an ArtDmx packet, for receivers and checks
+    :param packet: bytes of the udp datagram
+    :return: dict with universe, sequence and data, None if it is no ArtDmx packet
+    """
+    if len(packet) < 18 or packet[:8] != b"Art-Net\x00":
+        return None
+    opcode, = struct.unpack_from("<H", packet, 8)
+    version, sequence, physical, sub_uni, net, length = struct.unpack_from(">HBBBBH", packet, 10)
+    if opcode != 0x5000:
+        return None
+    return {"version": version, "sequence": sequence, "universe": net << 8 | sub_uni,
+            "data": bytes(packet[18:18 + length])}
+
+
+def parse_sacn(packet):
+    """
+    Decode an E1.31 data packet, for receivers and checks
+    :param packet: bytes of the udp datagram
+    :return: dict with universe, sequence, priority, source_name, cid, the pdu lengths and data,
+             None if it is no E1.31 data packet
+    """
+    if len(packet) < 126 or packet[4:16] != b"ASC-E1.17\x00\x00\x00":
+        return None
+    _, _, _, root_length, root_vector = struct.unpack_from(">HH12sHI", packet, 0)
+    cid = bytes(packet[22:38])
+    framing_length, framing_vector, name, priority, _, sequence, _, universe = \
+        struct.unpack_from(">HI64sBHBBH", packet, 38)
+    dmp_length, dmp_vector, address_type, first_address, increment, count, start_code = \
+        struct.unpack_from(">HBBHHHB", packet, 115)
+    if root_vector != 0x00000004 or framing_vector != 0x00000002 or dmp_vector != 0x02:
+        return None
+    return {"universe": universe, "sequence": sequence, "priority": priority,
+            "source_name": name.rstrip(b"\x00").decode(), "cid": cid,
+            "lengths": (root_length & 0xFFF, framing_length & 0xFFF, dmp_length & 0xFFF),
+            "start_code": start_code, "data": bytes(packet[126:126 + count - 1])}
+
+
+class NetworkController:
+    """
+    Base of the UDP controllers, subclasses build the packet template of a universe
+    """
+    # byte offsets of the sequence number and the first channel in the packet
+    sequence_offset = 0
+    data_offset = 0
+
+    def __init__(self, host, universes=1, first_universe=0, port=None):
+        """
+        :param host: ip address of the node, a broadcast or a multicast address
+        :param universes: number of consecutive universes
+        :param first_universe: protocol number of the first universe
+        :param port: udp port, defaults to the one of the protocol
+        """
+        self.host = host
+        self.port = port
+        self.universe_numbers = list(range(first_universe, first_universe + universes))
+        self.channels = bytearray(512 * universes)
+        self.sequence = 0
+        self.packets = [self.packet_template(universe) for universe in self.universe_numbers]
+        self.sockets = []
+        for universe in self.universe_numbers:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 4)
+            sock.connect(self.destination(universe))
+            self.sockets.append(sock)
+        self.packets_sent = 0
+        self.send_errors = 0
+
+    def packet_template(self, universe):
+        """
+        :param universe: protocol number of the universe
+        :return: bytearray of a whole packet with 512 channels, sequence and channels are filled by submit
+        """
+        raise NotImplementedError
+
+    def destination(self, universe):
+        """
+        :param universe: protocol number of the universe
+        :return: (host, port) the packets of the universe are sent to
+        """
+        return self.host, self.port
+
+    def next_sequence(self):
+        # 0 disables the sequence check of the receivers
+        self.sequence = self.sequence % 255 + 1
+        return self.sequence
+
+    def submit(self):
+        """
+        Send all universes with the same sequence number
+        :return:
+        """
+        sequence = self.next_sequence()
+        channels = memoryview(self.channels)
+        start = self.data_offset
+        for i, (sock, packet) in enumerate(zip(self.sockets, self.packets)):
+            packet[self.sequence_offset] = sequence
+            packet[start:start + 512] = channels[i * 512:(i + 1) * 512]
+            try:
+                sock.send(packet)
+                self.packets_sent += 1
+            except OSError:
+                # a missing node must not stop the other universes
+                self.send_errors += 1
+
+    def close(self):
+        for sock in self.sockets:
+            sock.close()
+        self.sockets = []
+
+
+class ArtNetController(NetworkController):
+    """
+    ArtDmx packets, the universe number is the 15 bit port address (net, sub net, universe)
+    """
+    sequence_offset = 12
+    data_offset = 18
+
+    def __init__(self, host, universes=1, first_universe=0, port=ARTNET_PORT):
+        """
+        :param host: ip address of the node or the broadcast address of its network, e.g. 2.255.255.255
+        :param universes: number of consecutive universes
+        :param first_universe: port address of the first universe, 0-32767
+        :param port: udp port
+        """
+        super().__init__(host, universes, first_universe, port)
+
+    def packet_template(self, universe):
+        header = b"Art-Net\x00" + struct.pack("<H", 0x5000) + struct.pack(">H", 14) \
+            + bytes([0, 0, universe & 0xFF, universe >> 8 & 0x7F]) + struct.pack(">H", 512)
+        return bytearray(header + bytes(512))
+
+
+class SACNController(NetworkController):
+    """
+    E1.31 data packets, sent to the multicast address of the universe unless a host is given
+    """
+    sequence_offset = 111
+    data_offset = 126
+
+    def __init__(self, host=None, universes=1, first_universe=1, port=SACN_PORT, source_name="Ambient Light",
+                 priority=100, cid=None):
+        """
+        :param host: ip address of the node, None for multicast 239.255.x.y of each universe
+        :param universes: number of consecutive universes
+        :param first_universe: number of the first universe, 1-63999
+        :param port: udp port
+        :param source_name: name of the source shown by the receivers
+        :param priority: priority of the data, 0-200, receivers show the source with the highest one
+        :param cid: 16 byte component identifier, random if None
+        """
+        self.source_name = source_name
+        self.priority = priority
+        self.cid = cid if cid is not None else uuid.uuid4().bytes
+        super().__init__(host, universes, first_universe, port)
+
+    def destination(self, universe):
+        if self.host is not None:
+            return self.host, self.port
+        return f"239.255.{universe >> 8}.{universe & 0xFF}", self.port
+
+    def packet_template(self, universe):
+        length = 126 + 512
+        root = struct.pack(">HH12sHI", 0x0010, 0x0000, b"ASC-E1.17\x00\x00\x00", 0x7000 | (length - 16), 0x00000004) \
+            + self.cid
+        framing = struct.pack(">HI64sBHBBH", 0x7000 | (length - 38), 0x00000002,
+                              source_name_bytes(self.source_name), self.priority, 0, 0, 0, universe)
+        dmp = struct.pack(">HBBHHHB", 0x7000 | (length - 115), 0x02, 0xA1, 0x0000, 0x0001, 512 + 1, 0)
+        return bytearray(root + framing + dmp + bytes(512))
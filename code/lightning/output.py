@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+
+
+class LoopbackController:
+    """
+    Controller without hardware for dry runs and tests
+
+    Same interface as the DMXEnttecPro Controller, submit keeps a copy of the channels instead of sending them.
+    """
+
+    def __init__(self, port=None, history=1000):
+        """
+        :param port: ignored, the signature of a controller factory
+        :param history: number of submitted frames to keep
+        """
+        self.port = port
+        self.channels = bytearray(512)
+        self.frames = deque(maxlen=history)
+        self.submits = 0
+
+    def submit(self):
+        self.frames.append(bytes(self.channels))
+        self.submits += 1
+
+    def close(self):
+        pass
+
+
+class OutputWorker:
+    """
+    Thread that submits the frames of the universes of one controller
+
+    The render loop hands over a frame without waiting for the interface. If the controller is still busy
+    with the previous frame, a waiting frame is replaced by the newer one, so a slow or stalled interface
+    drops frames instead of delaying the render loop or the other universes.
+    """
+
+    def __init__(self, controller, name, latency=None):
+        """
+        :param controller: object with channels, submit() and close() like the DMXEnttecPro Controller
+        :param name: thread name
+        :param latency: LatencyMonitor for the submit and total stage of highlighted notes
+        """
+        self.controller = controller
+        self.latency = latency
+        self.condition = threading.Condition()
+        self.frame = None  # next frame to submit
+        self.notes = []  # arrival and write time of the highlighted notes in the frame
+        self.active = True
+        # measured duration of a submit, moving average
+        self.submit_duration = 0.0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.thread = threading.Thread(target=self.run, name=name)
+        self.thread.start()
+
+    def submit(self, frame, notes=None):
+        """
+        Hand over a frame, replaces a frame that was not submitted yet
+        :param frame: channels of the universes of the controller
+        :param notes: list of (received, written) of highlighted notes, recorded when the frame is submitted
+        :return:
+        """
+        with self.condition:
+            if self.frame is not None:
+                self.frames_dropped += 1
+            self.frame = bytes(frame)
+            if notes:
+                # the notes of a dropped frame are shown by this one
+                self.notes.extend(notes)
+            self.condition.notify()
+
+    def run(self):
+        """
+        Submit loop, runs until close and submits the last handed over frame before it ends
+        :return:
+        """
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.frame is not None or not self.active)
+                if self.frame is None:
+                    return
+                frame, notes = self.frame, self.notes
+                self.frame, self.notes = None, []
+            start = time.time()
+            self.controller.channels[:] = frame
+            self.controller.submit()
+            submitted = time.time()
+            self.submit_duration = 0.9 * self.submit_duration + 0.1 * (submitted - start)
+            self.frames_sent += 1
+            if self.latency is not None:
+                for received, written in notes:
+                    self.latency.record("submit", submitted - written)
+                    self.latency.record("total", submitted - received)
+
+    def close(self):
+        """
+        Submit the waiting frame, stop the thread and close the controller
+        :return:
+        """
+        with self.condition:
+            self.active = False
+            self.condition.notify()
+        self.thread.join()
+        self.controller.close()
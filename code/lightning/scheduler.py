@@ -0,0 +1,58 @@
+import heapq
+import itertools
+import threading
+
+from diagnostics.trace import traced
+
+
+class Scheduler:
+    """
+    Heap of timed actions, run by the render loop of the universe
+
+    Actions are kept sorted by their due time, run executes all actions that are due
+    in the order they were scheduled. Actions run in the render thread and must not block.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queue = []
+        # tie breaker, actions with the same time run in insertion order
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def at(self, when, action, *args):
+        """
+        Schedule an action
+        :param when: time the action is due
+        :param action: function to call
+        :param args: arguments of the function
+        :return:
+        """
+        with self.lock:
+            heapq.heappush(self.queue, (when, next(self.counter), action, args))
+
+    @traced("dmx", "scheduled actions")
+    def run(self, now):
+        """
+        Run all actions that are due
+        :param now: current time
+        :return: number of actions run
+        """
+        due = []
+        with self.lock:
+            while self.queue and self.queue[0][0] <= now:
+                due.append(heapq.heappop(self.queue))
+        # run outside of the lock, actions may schedule new actions
+        for _, _, action, args in due:
+            action(*args)
+        return len(due)
+
+    def clear(self):
+        """
+        Drop all scheduled actions
+        :return:
+        """
+        with self.lock:
+            self.queue.clear()
@@ -1,33 +1,31 @@
+import os
 import threading
 import time
 from tkinter import colorchooser
 
 import rtmidi
-from midi.message import MidiMessage
-from lightning.dmx_controller import DMXUniverse, hsv_to_rgb
+from diagnostics import trace
+from diagnostics.latency import LatencyMonitor
+from midi.message import decode
+from lightning.colors import hex_to_rgb, hsv_to_hex
+from lightning.dmx_controller import DMXUniverse
+from lightning.output import LoopbackController
+from midi.history import History
+from midi.session_log import SessionLog
 from midi.tracker import MidiNoteTracker
-from midi.input import MidiInput
+from midi.input import MidiInput, MultiMidiInput
 from tkinter import *
 
 
 def main():
-    main_loop = MainLoop()
+    # opt-in tracing, e.g. LIGHT_TRACE=trace.json python main.py
+    if os.environ.get("LIGHT_TRACE"):
+        trace.enable(os.environ["LIGHT_TRACE"])
+    # LIGHT_DRY_RUN=1 runs without DMX hardware
+    main_loop = MainLoop(LoopbackController if os.environ.get("LIGHT_DRY_RUN") else None)
     gui(main_loop)
 
 
-def rgb_to_hex(rgb):
-    return '#%02x%02x%02x' % rgb
-
-
-def hsv_to_hex(hsv):
-    return rgb_to_hex(hsv_to_rgb(hsv))
-
-
-def hex_to_rgb(hex_color):
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
-
-
 def gui(main_loop):
     """
     GUI for the Ambient Light Project
@@ -70,14 +68,16 @@ def gui(main_loop):
     def start():
         drop_midi_port.config(state=DISABLED)
         try:
-            port = int(number_midi.get("1.0", END))
+            # several ports separated by commas are merged
+            ports = [int(p) for p in number_midi.get("1.0", END).split(",")]
+            port = ports[0] if len(ports) == 1 else ports
         except ValueError:
             print("else")
             port_subs = midi_port.get().split(" ")
-            port = port_subs[len(port_subs) - 1]
+            port = int(port_subs[len(port_subs) - 1])
         print(port)
 
-        main_loop.start_main(int(port))
+        main_loop.start_main(port)
         add_device.config(state=NORMAL)
         start_button.config(state=DISABLED)
         reset_tracker_button.config(state=NORMAL)
@@ -254,37 +254,60 @@ class MainLoop:
     """
     Main Loop for the Ambient Light Project
     """
-    def __init__(self):
+    def __init__(self, controller_factory=None):
+        """
+        :param controller_factory: factory of the DMX controllers, see DMXUniverse
+        """
+        self.controller_factory = controller_factory
         self.main_active = False
         self.midi_input = None
         self.tracker = None
         self.dmx_universe = None
+        self.latency = LatencyMonitor()
+        self.session_log = None
 
-    def start_main(self, port=None):
+    def start_main(self, port=None, source_weights=None, dmx_ports=None):
         """
         Start the main loop
-        :param port:
+        :param port: midi port number, list of port numbers or dict source -> port number to merge several ports
+        :param source_weights: dict source -> velocity factor of its notes in the tracker, see MidiNoteTracker
+        :param dmx_ports: serial ports of the DMX controllers, one universe each, defaults to the one of DMXUniverse
         :return:
         """
         self.main_active = True
 
         # initialize midi input and tracker
-        self.midi_input = MidiInput(port)
-        self.tracker = MidiNoteTracker()
-        self.dmx_universe = DMXUniverse(self.tracker)
+        if isinstance(port, (list, tuple, dict)):
+            self.midi_input = MultiMidiInput(port)
+        else:
+            self.midi_input = MidiInput(port)
+        session_directory = os.path.join("sessions", time.strftime("%Y%m%d-%H%M%S"))
+        self.session_log = SessionLog(session_directory)
+        self.session_log.new_segment(time.time())
+        # the older values of a long show are kept on disk next to the session log
+        history = History(os.path.join(session_directory, "history"))
+        self.tracker = MidiNoteTracker(latency=self.latency, history=history, session_log=self.session_log,
+                                       source_weights=source_weights)
+        if dmx_ports is None:
+            self.dmx_universe = DMXUniverse(self.tracker, latency=self.latency,
+                                            controller_factory=self.controller_factory)
+        else:
+            self.dmx_universe = DMXUniverse(self.tracker, dmx_ports, latency=self.latency,
+                                            controller_factory=self.controller_factory)
 
         main_thread = threading.Thread(target=self.main_loop, name="Main Thread")
         main_thread.start()
 
-    def add_dmx_device(self, device_name, start_channel, mode="normal"):
+    def add_dmx_device(self, device_name, start_channel, mode="normal", universe=0):
         """
         Add a new DMX device to the universe
         :param device_name:
         :param start_channel:
         :param mode:
+        :param universe: number of the DMX controller, in the order of dmx_ports
         :return:
         """
-        return self.dmx_universe.add_device(device_name, start_channel, mode)
+        return self.dmx_universe.add_device(device_name, start_channel, mode, universe)
 
     def remove_dmx_device(self, device_name):
         """
@@ -322,8 +345,18 @@ class MainLoop:
         return self.dmx_universe.devices[device_name].color_low_hsv, self.dmx_universe.devices[
             device_name].color_high_hsv
 
+    def get_latency_stats(self):
+        """
+        Get the latency percentiles of the note stages
+        :return: dict stage -> dict with count, p50, p95, p99 and max in milliseconds
+        """
+        return self.latency.stats()
+
     def stop_main(self):
         self.main_active = False
+        if self.midi_input is not None:
+            # wakes up the main loop if it is waiting for a message
+            self.midi_input.stop()
 
     def reset_tracker(self):
         self.tracker.reset()
@@ -334,25 +367,26 @@ class MainLoop:
         :return:
         """
         while self.main_active:
-            m = self.midi_input.midiin.get_message()
+            # blocks until a message arrives instead of spinning on the port
+            m = self.midi_input.get_message(timeout=0.5)
             if m:
-                midi_message = MidiMessage(m)
-                self.tracker.evaluate_midi_input(m)
-                if midi_message.get_midi_note_number() == 21:
+                received = self.midi_input.last_arrival
+                self.latency.record("input", time.time() - received)
+                midi_event = decode(m)
+                self.tracker.evaluate_midi_event(midi_event, received, self.midi_input.last_source)
+                # only the keys (the primary source) end a recording, not e.g. a pad with the same note
+                if midi_event.note == 21 and self.midi_input.last_source == self.midi_input.primary:
                     # save current data to file and then delete it
                     print("end seen")
                     if len(self.tracker.calculated_tempos) > 0:
-                        with open("mood_data.csv", "a") as file:
-                            print("Writing to file")
-                            print(self.tracker.all_arousal)
-                            file.write(f"{self.tracker.all_arousal};")
-                            file.write(f"{self.tracker.all_valence};")
-                            file.write(f"{self.tracker.calculated_tempos};")
-                            print(self.tracker.highlight_timings)
-                            file.write(f"{self.tracker.highlight_timings}\n")
+                        # the next recording gets its own segment in the session log
+                        self.session_log.new_segment(time.time())
                         self.reset_tracker()
 
         self.dmx_universe.close_universe()
+        self.session_log.close()
+        self.latency.dump("latency.json")
+        trace.disable()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,187 @@
+"""
+Chord recognition on 12-bit pitch class masks
+
+Bit i of a mask is set if pitch class i (C = 0, C# = 1, ..., B = 11) sounds. All chords a mask
+can contain are resolved once at import into CHORD_TABLE, so recognizing a chord is a table lookup
+no matter how many chord types are known.
+"""
+
+NOTE_NAMES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+
+# intervals above the root, of equally large matches the one on the bass wins, then the earlier type
+CHORD_TYPES = {
+    "Dominant7": (0, 4, 7, 10),
+    "Major7": (0, 4, 7, 11),
+    "Minor7": (0, 3, 7, 10),
+    "HalfDiminished7": (0, 3, 6, 10),
+    "Diminished7": (0, 3, 6, 9),
+    "Major": (0, 4, 7),
+    "Minor": (0, 3, 7),
+    "Diminished": (0, 3, 6),
+    "Augmented": (0, 4, 8),
+    "Sus4": (0, 5, 7),
+    "Sus2": (0, 2, 7),
+}
+
+# valence of the chord types, 1 major, -1 minor, 0 neutral
+TONALITY = {
+    "Dominant7": 1,
+    "Major7": 1,
+    "Major": 1,
+    "Augmented": 1,
+    "Minor7": -1,
+    "HalfDiminished7": -1,
+    "Diminished7": -1,
+    "Minor": -1,
+    "Diminished": -1,
+    "Sus4": 0,
+    "Sus2": 0,
+}
+
+# intervals above the lowest note that decide the tonality if no complete chord is played,
+# the rule of the first chord estimation
+THIRDS = {4: "Major", 11: "Major", 3: "Minor", 10: "Minor"}
+
+
+def pitch_class_mask(notes):
+    """
+    :param notes: midi note numbers
+    :return: 12-bit mask of their pitch classes
+    """
+    mask = 0
+    for note in notes:
+        mask |= 1 << (note % 12)
+    return mask
+
+
+def rotate(mask, steps):
+    """
+    Transpose a pitch class mask down by steps semitones, pitch class `steps` becomes bit 0
+    """
+    steps %= 12
+    return ((mask >> steps) | (mask << (12 - steps))) & 0xFFF
+
+
+def _chord_table():
+    templates = [(root, chord_type, rotate(pitch_class_mask(intervals), -root))
+                 for chord_type, intervals in CHORD_TYPES.items() for root in range(12)]
+    table = []
+    for mask in range(4096):
+        best = []
+        best_size = 0
+        for root, chord_type, template in templates:
+            if template & mask == template:
+                size = len(CHORD_TYPES[chord_type])
+                if size > best_size:
+                    best, best_size = [], size
+                if size == best_size:
+                    best.append((root, chord_type))
+        table.append(tuple(best))
+    return table
+
+
+def _thirds_table():
+    table = []
+    for mask in range(4096):
+        chord_type = None
+        for interval in range(1, 12):
+            if mask >> interval & 1 and interval in THIRDS:
+                chord_type = THIRDS[interval]
+                break
+        table.append(chord_type)
+    return table
+
+
+# mask -> tuple of (root, chord type) of the largest chords in the mask, several for ambiguous masks
+# like symmetric chords or sus2 / sus4
+CHORD_TABLE = _chord_table()
+# mask transposed to the lowest note -> chord type of the first third above it or None
+THIRDS_TABLE = _thirds_table()
+
+
+def identify(mask, bass=None):
+    """
+    Recognize the chord of a pitch class mask
+    :param mask: 12-bit pitch class mask
+    :param bass: pitch class of the lowest note, decides between ambiguous chords
+                 and gives the root if no complete chord is played
+    :return: tuple (root pitch class, chord type) or None
+    """
+    candidates = CHORD_TABLE[mask]
+    if candidates:
+        for root, chord_type in candidates:
+            if root == bass:
+                return root, chord_type
+        return candidates[0]
+    if bass is None:
+        return None
+    chord_type = THIRDS_TABLE[rotate(mask, bass)]
+    return None if chord_type is None else (bass, chord_type)
+
+
+class ChordRecognizer:
+    """
+    Pitch class mask of the sounding notes, updated with every note that starts or stops sounding
+
+    A note can sound several times at once, e.g. from two midi sources, it stops sounding with its last note off.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """
+        Silence all notes
+        :return:
+        """
+        self.counts = [0] * 12  # sounding notes per pitch class
+        self.note_counts = [0] * 128  # how often each midi note sounds
+        self.mask = 0
+        self.notes = 0  # 128-bit mask of the sounding midi notes, the lowest bit is the bass
+
+    def note_on(self, note):
+        """
+        A note starts sounding
+        :param note: midi note number
+        :return:
+        """
+        self.note_counts[note] += 1
+        if self.note_counts[note] > 1:
+            return
+        self.notes |= 1 << note
+        pitch_class = note % 12
+        self.counts[pitch_class] += 1
+        self.mask |= 1 << pitch_class
+
+    def note_off(self, note):
+        """
+        A note stops sounding
+        :param note: midi note number
+        :return:
+        """
+        if self.note_counts[note] == 0:
+            return
+        self.note_counts[note] -= 1
+        if self.note_counts[note] > 0:
+            return
+        self.notes &= ~(1 << note)
+        pitch_class = note % 12
+        self.counts[pitch_class] -= 1
+        if self.counts[pitch_class] == 0:
+            self.mask &= ~(1 << pitch_class)
+
+    def bass(self):
+        """
+        :return: lowest sounding midi note or None
+        """
+        if not self.notes:
+            return None
+        return (self.notes & -self.notes).bit_length() - 1
+
+    def chord(self):
+        """
+        :return: tuple (root pitch class, chord type) of the sounding notes or None
+        """
+        if not self.mask:
+            return None
+        return identify(self.mask, self.bass() % 12)
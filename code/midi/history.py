@@ -0,0 +1,184 @@
+import os
+import threading
+
+import numpy as np
+
+
+class SpillingSeries:
+    """
+    Append-only series with a bounded in-memory tail
+
+    The newest rows are kept in a numpy array of 2 * tail rows. When it is full, the older half
+    is appended to a binary file of the history directory and dropped from memory, so the memory
+    stays the same for any session length while all rows can still be read back. A history without
+    a directory keeps all rows in memory and doubles the array instead.
+    Rows are scalars or tuples matching the numpy dtype.
+    """
+
+    def __init__(self, history, name, dtype, tail=4096):
+        """
+        :param history: History that owns the spill directory
+        :param name: file name of the spilled rows, without extension
+        :param dtype: numpy dtype of the rows, e.g. "f8" or [("time", "f8"), ("type", "i1")]
+        :param tail: number of rows that are always kept in memory
+        """
+        self.history = history
+        self.name = name
+        self.dtype = np.dtype(dtype)
+        self.tail = tail
+        self.lock = threading.Lock()
+        self.buffer = np.zeros(2 * tail, dtype=self.dtype)
+        self.size = 0  # rows in the buffer
+        self.spilled = 0  # rows in the file
+        self.path = None
+
+    def __len__(self):
+        return self.spilled + self.size
+
+    def append(self, row):
+        """
+        Append a row, spills the older half of the memory if it is full
+        :param row: scalar or tuple of the dtype
+        :return:
+        """
+        with self.lock:
+            if self.size == len(self.buffer):
+                if self.history.directory is None:
+                    self.buffer = np.concatenate((self.buffer, np.zeros(len(self.buffer), dtype=self.dtype)))
+                else:
+                    self._spill(self.size - self.tail)
+            self.buffer[self.size] = row
+            self.size += 1
+
+    def _spill(self, count):
+        if self.path is None:
+            self.path = self.history.path(self.name)
+        with open(self.path, "ab") as file:
+            self.buffer[:count].tofile(file)
+        self.buffer[:self.size - count] = self.buffer[count:self.size]
+        self.size -= count
+        self.spilled += count
+
+    def clear(self):
+        """
+        Remove all rows from memory and disk
+        :return:
+        """
+        with self.lock:
+            self.size = 0
+            self.spilled = 0
+            if self.path is not None and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def recent(self):
+        """
+        :return: copy of the rows in memory, the newest tail to 2 * tail rows or all without a directory
+        """
+        with self.lock:
+            return self.buffer[:self.size].copy()
+
+    def on_disk(self):
+        """
+        :return: read-only memmap of the spilled rows
+        """
+        with self.lock:
+            if self.spilled == 0:
+                return np.zeros(0, dtype=self.dtype)
+            return np.memmap(self.path, dtype=self.dtype, mode="r", shape=(self.spilled,))
+
+    def to_array(self):
+        """
+        :return: array with all rows, read from disk and memory
+        """
+        with self.lock:
+            recent = self.buffer[:self.size].copy()
+            if self.spilled == 0:
+                return recent
+            spilled = np.fromfile(self.path, dtype=self.dtype, count=self.spilled)
+        return np.concatenate((spilled, recent))
+
+    def to_list(self):
+        """
+        :return: list with all rows as python values
+        """
+        return self.to_array().tolist()
+
+    def __getitem__(self, index):
+        """
+        Rows by index or slice like a list, slices of the memory tail are not read from disk
+        :return: python value or list
+        """
+        if isinstance(index, slice):
+            with self.lock:
+                start, stop, step = index.indices(self.spilled + self.size)
+                if start >= self.spilled and stop >= self.spilled:
+                    return self.buffer[start - self.spilled:stop - self.spilled:step].tolist()
+            return self.to_array()[index].tolist()
+        with self.lock:
+            if index < 0:
+                index += self.spilled + self.size
+            if self.spilled <= index < self.spilled + self.size:
+                return self.buffer[index - self.spilled].tolist()
+        return self.to_array()[index].tolist()
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __repr__(self):
+        # same text as the list it replaces, e.g. for the csv export
+        return repr(self.to_list())
+
+
+class History:
+    """
+    Spill directory of the series of one tracker
+
+    Without a directory nothing is written and the series keep all rows in memory, e.g. for replays
+    and benchmarks whose trackers are never shut down.
+    """
+
+    def __init__(self, directory=None, tail=4096):
+        """
+        :param directory: directory of the spilled series, None to keep all rows in memory
+        :param tail: default number of rows each series keeps in memory
+        """
+        self.directory = directory
+        self.tail = tail
+        self.series = {}
+
+    def create(self, name, dtype, tail=None):
+        """
+        Create a series
+        :param name: unique name, used as file name
+        :param dtype: numpy dtype of the rows
+        :param tail: rows kept in memory, defaults to the tail of the history
+        :return: SpillingSeries
+        """
+        series = SpillingSeries(self, name, dtype, tail or self.tail)
+        self.series[name] = series
+        return series
+
+    def path(self, name):
+        """
+        :param name: name of a series
+        :return: file path of the spilled rows, creates the directory if needed
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{name}.bin")
+
+    def clear(self):
+        """
+        Clear all series
+        :return:
+        """
+        for series in self.series.values():
+            series.clear()
+
+    def close(self):
+        """
+        Clear all series and remove their files
+        :return:
+        """
+        self.clear()
+        if self.directory is not None and os.path.isdir(self.directory) and not os.listdir(self.directory):
+            os.rmdir(self.directory)
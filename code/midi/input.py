@@ -1,13 +1,34 @@
+import queue
 import rtmidi
 import threading
+import time
+from collections import deque
 
 
 class MidiInput:
-    def __init__(self, port=1):
+    def __init__(self, port=1, mode="callback", source=None, on_message=None):
+        """
+        :param port: rtmidi port number, asks on the console if None
+        :param mode: "callback" to let rtmidi push messages into a blocking queue,
+                     "poll" to read them with rtmidi's non-blocking get_message
+        :param source: tag of the messages of this port, e.g. "keys"
+        :param on_message: function(message, source) the rtmidi thread calls instead of queueing the
+                           message, used by MultiMidiInput
+        """
         self.midiin = rtmidi.MidiIn()
         self.port = port
+        self.mode = mode
+        self.source = source
+        self.on_message = on_message
         self.stop_event = threading.Event()
-        self._open_port()
+        self.messages = queue.Queue()
+        # time.time() the last message returned by get_message arrived and its source
+        self.last_arrival = None
+        self.last_source = source
+        # source whose note 21 resets the tracker in MainLoop
+        self.primary = source
+        if self._open_port() and self.mode == "callback":
+            self.midiin.set_callback(self._on_message)
 
     def _open_port(self):
         """
@@ -30,12 +51,38 @@ class MidiInput:
         print("Midi port not found")
         return False
 
-    def get_message(self):
+    def _on_message(self, message, data=None):
         """
-        Get a midi message from the input
+        rtmidi callback, runs in the rtmidi input thread for every incoming message
+        :param message: tuple ([status, data1, data2], delta_time)
+        :param data:
         :return:
         """
-        return self.midiin.get_message()
+        if self.on_message is not None:
+            self.on_message(message, self.source)
+            return
+        self.messages.put((message, time.time()))
+
+    def get_message(self, timeout=None):
+        """
+        Get a midi message from the input
+        In callback mode this blocks until a message arrives, the timeout expires or the input is stopped
+        :param timeout: seconds to wait for a message, None waits forever
+        :return: tuple ([status, data1, data2], delta_time) or None
+        """
+        if self.mode != "callback":
+            self.last_arrival = time.time()
+            return self.midiin.get_message()
+        if self.stop_event.is_set():
+            return None
+        try:
+            item = self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is None:
+            return None
+        message, self.last_arrival = item
+        return message
 
     def stop(self):
         """
@@ -43,4 +90,71 @@ class MidiInput:
         :return:
         """
         self.stop_event.set()
+        if self.mode == "callback":
+            self.midiin.cancel_callback()
+            # wake up a consumer blocked in get_message
+            self.messages.put(None)
         self.midiin.close_port()
+
+
+class MultiMidiInput:
+    """
+    Several midi ports merged into one stream ordered by arrival
+
+    Every port keeps its own rtmidi input thread, the callbacks stamp the messages and append them
+    to one deque under a condition, so the order of the stream is the order of the timestamps and
+    the consumer sleeps until a message of any port arrives. get_message has the same interface
+    as MidiInput.get_message, last_source tells which port the message came from.
+    """
+
+    def __init__(self, ports):
+        """
+        :param ports: dict source -> rtmidi port number, or list of port numbers that are their own source,
+                      the first one is the primary source, e.g. the keys
+        """
+        if not isinstance(ports, dict):
+            ports = {port: port for port in ports}
+        self.primary = next(iter(ports))
+        self.condition = threading.Condition()
+        self.messages = deque()  # (message, time.time() it arrived, source)
+        self.stopped = False
+        self.last_arrival = None
+        self.last_source = None
+        self.inputs = {source: MidiInput(port, source=source, on_message=self._on_message)
+                       for source, port in ports.items()}
+
+    def _on_message(self, message, source):
+        """
+        Callback of the port inputs, runs in their rtmidi threads
+        :param message: tuple ([status, data1, data2], delta_time)
+        :param source: source of the port
+        :return:
+        """
+        with self.condition:
+            # stamped under the lock, so the deque is sorted by arrival
+            self.messages.append((message, time.time(), source))
+            self.condition.notify()
+
+    def get_message(self, timeout=None):
+        """
+        Get the oldest midi message of all ports
+        Blocks until a message arrives, the timeout expires or the input is stopped
+        :param timeout: seconds to wait for a message, None waits forever
+        :return: tuple ([status, data1, data2], delta_time) or None
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.messages or self.stopped, timeout) or self.stopped:
+                return None
+            message, self.last_arrival, self.last_source = self.messages.popleft()
+        return message
+
+    def stop(self):
+        """
+        Stop all inputs and close their ports
+        :return:
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        for midi_input in self.inputs.values():
+            midi_input.stop()
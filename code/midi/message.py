@@ -101,3 +101,58 @@ class MidiMessage:
         :return: float time relative to the last event
         """
         return self.m[1]
+
+
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+CONTROL_CHANGE = 0xB0
+
+
+class MidiEvent:
+    """
+    Decoded midi message
+    For pedal (control change) messages note is the controller number and velocity the controller value
+    """
+    __slots__ = ("type", "channel", "note", "velocity", "delta")
+
+    def __init__(self, type, channel, note, velocity, delta):
+        self.type = type
+        self.channel = channel
+        self.note = note
+        self.velocity = velocity
+        self.delta = delta
+
+    def __repr__(self):
+        return f"MidiEvent({self.type}, channel={self.channel}, note={self.note}, velocity={self.velocity})"
+
+
+def decode(message):
+    """
+    Decode a raw rtmidi message by its integer status byte
+    Same classification as MidiMessage.get_type, every control change counts as pedal
+    :param message: tuple ([status, data1, data2], delta_time)
+    :return: MidiEvent
+    """
+    data, delta = message
+    status = data[0]
+    kind = status & 0xF0
+    note = data[1] if len(data) > 1 else 0
+    velocity = data[2] if len(data) > 2 else 0
+    if kind == NOTE_ON:
+        event_type = "note_on"
+    elif kind == NOTE_OFF:
+        event_type = "note_off"
+    elif kind == CONTROL_CHANGE:
+        event_type = "pedal_on" if velocity != 0 else "pedal_off"
+    else:
+        event_type = "unknown"
+    return MidiEvent(event_type, status & 0x0F, note, velocity, delta)
+
+
+def decode_batch(messages):
+    """
+    Decode a list of raw rtmidi messages
+    :param messages: list of tuples ([status, data1, data2], delta_time)
+    :return: list of MidiEvent
+    """
+    return [decode(message) for message in messages]
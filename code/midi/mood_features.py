@@ -0,0 +1,174 @@
+import bisect
+import math
+import threading
+from collections import deque
+
+
+class MoodFeatures:
+    """
+    Running statistics of the notes in a sliding time window for the mood estimation
+
+    Notes are added when they are played and expire when the window is moved, every statistic
+    is updated with the entering and leaving note instead of being recomputed from the window:
+    integer sums for count, mean, standard deviation and centroid, monotonic deques for the
+    lowest, highest and loudest note, and a sorted list of the inter-onset intervals.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """
+        Remove all notes
+        :return:
+        """
+        self.notes = deque()  # (note, time, velocity), sorted by time
+        self.gaps = deque()  # time between two consecutive notes in the window
+        self.sorted_gaps = []
+        # deques of (value, time), the front is the extreme value of the window
+        self.low = deque()  # increasing notes
+        self.high = deque()  # decreasing notes
+        self.loud = deque()  # decreasing velocities, the earliest of equal velocities first
+        self.velocity_sum = 0
+        self.note_sum = 0
+        self.note_square_sum = 0
+        self.weighted_note_sum = 0  # sum of note * velocity
+
+    def __len__(self):
+        return len(self.notes)
+
+    def add(self, note, time, velocity):
+        """
+        Add a note, not older than the last added one
+        :param note:
+        :param time:
+        :param velocity:
+        :return:
+        """
+        with self.lock:
+            if self.notes:
+                gap = time - self.notes[-1][1]
+                self.gaps.append(gap)
+                bisect.insort(self.sorted_gaps, gap)
+            self.notes.append((note, time, velocity))
+            while self.low and self.low[-1][0] >= note:
+                self.low.pop()
+            self.low.append((note, time))
+            while self.high and self.high[-1][0] <= note:
+                self.high.pop()
+            self.high.append((note, time))
+            while self.loud and self.loud[-1][0] < velocity:
+                self.loud.pop()
+            self.loud.append((velocity, time))
+            self.velocity_sum += velocity
+            self.note_sum += note
+            self.note_square_sum += note * note
+            self.weighted_note_sum += note * velocity
+
+    def expire(self, start_time):
+        """
+        Move the start of the window, notes played at or before start_time are removed
+        :param start_time:
+        :return:
+        """
+        with self.lock:
+            while self.notes and self.notes[0][1] <= start_time:
+                note, time, velocity = self.notes.popleft()
+                if self.gaps:
+                    gap = self.gaps.popleft()
+                    del self.sorted_gaps[bisect.bisect_left(self.sorted_gaps, gap)]
+                # the front of a deque is this note if it was the extreme value
+                for extremes in (self.low, self.high, self.loud):
+                    if extremes and extremes[0][1] <= start_time:
+                        extremes.popleft()
+                self.velocity_sum -= velocity
+                self.note_sum -= note
+                self.note_square_sum -= note * note
+                self.weighted_note_sum -= note * velocity
+
+    def snapshot(self, min_gap):
+        """
+        Get all statistics of the window at once
+        :param min_gap: notes that follow the previous one within min_gap seconds count as one onset
+        :return: dict with count, lowest_note, highest_note, max_velocity, max_velocity_time, mean_velocity,
+                 std_notes (population standard deviation), centroid (mean note weighted with the velocities)
+                 and onsets, None if the window is empty
+        """
+        with self.lock:
+            count = len(self.notes)
+            if count == 0:
+                return None
+            max_velocity, max_velocity_time = self.loud[0]
+            return {
+                "count": count,
+                "lowest_note": self.low[0][0],
+                "highest_note": self.high[0][0],
+                "max_velocity": max_velocity,
+                "max_velocity_time": max_velocity_time,
+                "mean_velocity": self.velocity_sum / count,
+                # exact integer variance numerator
+                "std_notes": math.sqrt((count * self.note_square_sum - self.note_sum ** 2) / (count * count)),
+                "centroid": self.weighted_note_sum / self.velocity_sum if self.velocity_sum else None,
+                "onsets": len(self.sorted_gaps) - bisect.bisect_right(self.sorted_gaps, min_gap) + 1,
+            }
+
+
+class ChordWindow:
+    """
+    Most common chord of a sliding time window
+
+    Equal chords are appended directly after each other, when every note of a chord is detected
+    as it is played. They are kept as runs with a count, a monotonic deque of the runs gives the run
+    with the highest count, of equal counts the latest one.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """
+        Remove all chords
+        :return:
+        """
+        self.runs = deque()  # [chord, count], chord is (timestamp, root, chord type)
+        self.largest = deque()  # runs with decreasing count
+
+    def add(self, chord):
+        """
+        Add a chord, not older than the last added one
+        :param chord: tuple (timestamp, root, chord type)
+        :return:
+        """
+        with self.lock:
+            if self.runs and self.runs[-1][0] == chord:
+                run = self.runs[-1]
+                run[1] += 1
+                # the last run is always in largest, as last element
+                self.largest.pop()
+            else:
+                run = [chord, 1]
+                self.runs.append(run)
+            while self.largest and self.largest[-1][1] <= run[1]:
+                self.largest.pop()
+            self.largest.append(run)
+
+    def expire(self, start_time):
+        """
+        Remove the chords detected at or before start_time
+        :param start_time:
+        :return:
+        """
+        with self.lock:
+            while self.runs and self.runs[0][0][0] <= start_time:
+                run = self.runs.popleft()
+                if self.largest and self.largest[0] is run:
+                    self.largest.popleft()
+
+    def most_common(self):
+        """
+        :return: most common chord (timestamp, root, chord type) or None
+        """
+        with self.lock:
+            return self.largest[0][0] if self.largest else None
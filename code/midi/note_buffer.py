@@ -0,0 +1,92 @@
+import numpy as np
+
+
+class NoteBuffer:
+    """
+    Fixed capacity ring buffer for played notes (note, time, velocity)
+
+    The columns are numpy arrays sorted by time. The live notes always lie in one contiguous slice,
+    so window queries are a binary search on the timestamps and return views instead of copies.
+    When the write position reaches the end of the storage the live notes are moved to the front,
+    the storage is three times the capacity so views handed out before stay valid
+    for at least `capacity` further appends.
+    """
+
+    def __init__(self, capacity=8192):
+        self.capacity = capacity
+        self.notes = np.zeros(3 * capacity, dtype=np.int32)
+        self.times = np.zeros(3 * capacity, dtype=np.float64)
+        self.velocities = np.zeros(3 * capacity, dtype=np.int32)
+        # (start, end, total) of the live slice, assigned as one tuple so readers never see a half update
+        # total is the number of notes ever appended and used as absolute index
+        self._bounds = (0, 0, 0)
+
+    def __len__(self):
+        start, end, _ = self._bounds
+        return end - start
+
+    @property
+    def total(self):
+        """
+        Number of notes ever appended, the absolute index of the next note
+        """
+        return self._bounds[2]
+
+    def append(self, note, time, velocity):
+        """
+        Append a note, the oldest note is dropped if the buffer is full
+        :param note: midi note number
+        :param time: timestamp, not older than the last appended note
+        :param velocity:
+        :return:
+        """
+        start, end, total = self._bounds
+        if end == len(self.times):
+            size = end - start
+            self.notes[:size] = self.notes[start:end]
+            self.times[:size] = self.times[start:end]
+            self.velocities[:size] = self.velocities[start:end]
+            start, end = 0, size
+        self.notes[end] = note
+        self.times[end] = time
+        self.velocities[end] = velocity
+        end += 1
+        if end - start > self.capacity:
+            start += 1
+        self._bounds = (start, end, total + 1)
+
+    def clear(self):
+        """
+        Remove all notes
+        :return:
+        """
+        self._bounds = (0, 0, self._bounds[2])
+
+    def last(self):
+        """
+        Get the last played note
+        :return: tuple (note, time, velocity) or None
+        """
+        start, end, _ = self._bounds
+        if end == start:
+            return None
+        return self.notes[end - 1], self.times[end - 1], self.velocities[end - 1]
+
+    def window(self, start_time):
+        """
+        Get all notes played after start_time
+        :param start_time: timestamp, notes at exactly this time are excluded
+        :return: tuple of views (notes, times, velocities)
+        """
+        _, notes, times, velocities = self.indexed_window(start_time)
+        return notes, times, velocities
+
+    def indexed_window(self, start_time):
+        """
+        Get all notes played after start_time together with the absolute index of the first one
+        :param start_time: timestamp, notes at exactly this time are excluded
+        :return: tuple (first absolute index, notes, times, velocities)
+        """
+        start, end, total = self._bounds
+        start += int(np.searchsorted(self.times[start:end], start_time, side='right'))
+        return total - (end - start), self.notes[start:end], self.times[start:end], self.velocities[start:end]
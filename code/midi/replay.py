@@ -0,0 +1,146 @@
+import mido
+
+from midi.message import decode
+from midi.tracker import MidiNoteTracker
+
+
+class VirtualClock:
+    """
+    Clock for the tracker that only moves when the replay sets it, it never goes back
+    """
+
+    def __init__(self, start=0.0):
+        self._now = start
+
+    def __call__(self):
+        return self._now
+
+    @property
+    def now(self):
+        return self._now
+
+    @now.setter
+    def now(self, now):
+        if now < self._now:
+            raise ValueError(f"virtual clock went back from {self._now} to {now}")
+        self._now = now
+
+
+class ReplayResult:
+    """
+    Series a live session would have produced for a replayed file
+    """
+
+    def __init__(self, tracker, duration):
+        self.tracker = tracker
+        self.duration = duration  # seconds of music
+        self.tempos = []  # (timestamp, bpm)
+        self.moods = []  # (timestamp, arousal, valence)
+        self.beats = []  # (timestamp, beat timestamp, period, strength)
+
+    @property
+    def highlights(self):
+        """
+        :return: list of (timestamp, highlight type)
+        """
+        return self.tracker.highlight_timings.to_list()
+
+    @property
+    def chords(self):
+        """
+        :return: list of (timestamp, root pitch class, chord_type)
+        """
+        return self.tracker.estimated_chords.to_list()
+
+
+def read_midi_file(path):
+    """
+    Read the channel messages of a standard midi file
+    :param path: path to a .mid file
+    :return: list of (time in seconds, raw midi message) sorted by time
+    """
+    messages = []
+    current_time = 0.0
+    for message in mido.MidiFile(path, clip=True):
+        current_time += message.time
+        if not message.is_meta and message.type != "sysex":
+            messages.append((current_time, message.bytes()))
+    return messages
+
+
+def replay(source, tail=0.0, session_log=None):
+    """
+    Feed a midi file through a MidiNoteTracker as fast as possible
+
+    A virtual clock jumps from event to event. Between the messages the tempo and mood estimation
+    run at the times their manager threads would: the tempo every tempo_interval from the start,
+    the mood every mood_interval after the first tempo and, if no mood could be estimated,
+    again with the next note.
+    :param source: path to a .mid file or list of (time in seconds, raw midi message)
+    :param tail: seconds to keep estimating after the last message
+    :param session_log: SessionLog to write the estimations to, e.g. to compare them with a live session
+    :return: ReplayResult
+    """
+    messages = read_midi_file(source) if isinstance(source, str) else source
+    clock = VirtualClock()
+    tracker = MidiNoteTracker(clock=clock, threaded=False, session_log=session_log)
+    if session_log is not None:
+        session_log.new_segment(clock.now)
+    end_time = (messages[-1][0] if messages else 0.0) + tail
+    result = ReplayResult(tracker, end_time)
+
+    next_tempo = 0.0
+    next_mood = None
+    waiting_for_note = False
+    i = 0
+    while True:
+        next_tick = next_tempo if next_mood is None else min(next_tempo, next_mood)
+        woken = False
+        while i < len(messages) and messages[i][0] <= next_tick:
+            clock.now, message = messages[i]
+            i += 1
+            if tracker.evaluate_midi_event(decode((message, 0.0))) == "note_on" and waiting_for_note:
+                # the mood manager was waiting for this note
+                waiting_for_note = False
+                next_mood = clock.now
+                woken = True
+                break
+        if woken:
+            # the mood now runs before next_tick
+            continue
+        if next_tick > end_time:
+            break
+        clock.now = next_tick
+        if next_tick == next_tempo:
+            bpm = tracker.update_tempo()
+            if bpm is not None:
+                result.tempos.append((clock.now, bpm))
+                if tracker.beat is not None:
+                    result.beats.append((clock.now,) + tracker.beat)
+                if next_mood is None and not waiting_for_note:
+                    # the mood manager starts with the first tempo
+                    next_mood = clock.now
+            next_tempo += tracker.tempo_interval
+        else:
+            mood = tracker.update_mood()
+            if mood is not None:
+                result.moods.append((clock.now, mood[0], mood[1]))
+                next_mood += tracker.mood_interval
+            else:
+                next_mood = None
+                waiting_for_note = True
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    for path in sys.argv[1:]:
+        start = time.perf_counter()
+        replay_result = replay(path)
+        elapsed = time.perf_counter() - start
+        tempos = [bpm for _, bpm in replay_result.tempos]
+        print(f"{path}: {replay_result.duration:.1f} s of music in {elapsed * 1000:.0f} ms, "
+              f"{len(tempos)} tempos (last {tempos[-1] if tempos else None} bpm), "
+              f"{len(replay_result.moods)} moods, {len(replay_result.highlights)} highlights")
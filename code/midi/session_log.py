@@ -0,0 +1,228 @@
+"""
+Binary session log of the tracker estimations
+
+A session is a directory with one raw little-endian file per column (<table>.<column>.bin) and a
+schema.json with the dtypes. Rows are appended while the show runs, the reader maps the column files
+into numpy arrays without parsing, so long sessions load instantly.
+
+Tables:
+    segments   time, tempo, mood,         start of every recording, main starts a new one with each reset,
+               highlight                  and the index of the first row of each table in it
+    tempo      time, bpm
+    mood       time, arousal, valence
+    highlight  time, type                 0 velocity, 1 intensity highlight
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+VERSION = 2
+
+TABLES = {
+    "segments": (("time", "<f8"), ("tempo", "<i8"), ("mood", "<i8"), ("highlight", "<i8")),
+    "tempo": (("time", "<f8"), ("bpm", "<f8")),
+    "mood": (("time", "<f8"), ("arousal", "<f8"), ("valence", "<f8")),
+    "highlight": (("time", "<f8"), ("type", "i1")),
+}
+
+
+def column_path(directory, table, column):
+    return os.path.join(directory, f"{table}.{column}.bin")
+
+
+def stored_rows(directory, table, columns):
+    """
+    :return: number of complete rows of a table in the column files
+    """
+    counts = []
+    for column, dtype in columns:
+        path = column_path(directory, table, column)
+        counts.append(os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0)
+    # a session that crashed while writing may have a partial row
+    return min(counts)
+
+
+class SessionLog:
+    """
+    Writer of a session directory
+
+    append only buffers the row, it is called from the tracker threads on the note path. A writer
+    thread appends the buffered rows to the column files every flush_interval seconds, also when no
+    new rows arrive, so a crashed session loses at most that much.
+    """
+
+    def __init__(self, directory, flush_interval=1.0):
+        """
+        :param directory: session directory, created if needed, existing column files are appended to,
+                          the segments find their rows by index, so their clocks may start again at 0
+        :param flush_interval: seconds rows are kept in memory before they are written
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        # lock of the row buffers, held only to swap them
+        self.lock = threading.Lock()
+        # lock of the files, held while writing
+        self.write_lock = threading.Lock()
+        self.rows = {table: [] for table in TABLES}
+        os.makedirs(directory, exist_ok=True)
+        schema_path = os.path.join(directory, "schema.json")
+        if os.path.exists(schema_path):
+            with open(schema_path) as file:
+                version = json.load(file)["version"]
+            if version != VERSION:
+                raise ValueError(f"cannot append to a session of version {version}, the log writes {VERSION}")
+        # rows of every table, written and buffered, the first row indices of a new segment
+        self.counts = {table: stored_rows(directory, table, columns) for table, columns in TABLES.items()}
+        for table, columns in TABLES.items():
+            for column, dtype in columns:
+                path = column_path(directory, table, column)
+                if os.path.exists(path):
+                    # cut a partial row so the appended rows line up
+                    os.truncate(path, self.counts[table] * np.dtype(dtype).itemsize)
+        schema = {
+            "version": VERSION,
+            "tables": {table: dict(columns) for table, columns in TABLES.items()},
+        }
+        with open(schema_path, "w") as file:
+            json.dump(schema, file, indent=2)
+        self.files = {(table, column): open(column_path(directory, table, column), "ab")
+                      for table, columns in TABLES.items() for column, _ in columns}
+        self.active = True
+        self.wake = threading.Event()
+        self.writer = threading.Thread(target=self.write_loop, name="Session Log", daemon=True)
+        self.writer.start()
+
+    def append(self, table, *row):
+        """
+        Append a row, it is written by the writer thread
+        :param table: name of a table of TABLES
+        :param row: one value per column
+        :return:
+        """
+        with self.lock:
+            self.rows[table].append(row)
+            self.counts[table] += 1
+
+    def new_segment(self, timestamp):
+        """
+        Start a new recording, the rows from timestamp on belong to it
+        :param timestamp: clock time of the tracker
+        :return:
+        """
+        with self.lock:
+            self.rows["segments"].append((timestamp,) + tuple(self.counts[table] for table in TABLES
+                                                              if table != "segments"))
+            self.counts["segments"] += 1
+        # write the finished recording now instead of with the next interval
+        self.wake.set()
+
+    def write_loop(self):
+        """
+        Writer thread, flushes every flush_interval seconds until close
+        :return:
+        """
+        while self.active:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered rows
+        :return:
+        """
+        with self.lock:
+            buffered = self.rows
+            self.rows = {table: [] for table in TABLES}
+        with self.write_lock:
+            if not self.files:
+                return
+            for table, rows in buffered.items():
+                if not rows:
+                    continue
+                for i, (column, dtype) in enumerate(TABLES[table]):
+                    file = self.files[(table, column)]
+                    file.write(np.array([row[i] for row in rows], dtype=dtype).tobytes())
+                    file.flush()
+
+    def close(self):
+        """
+        Stop the writer, write all buffered rows and close the files
+        :return:
+        """
+        self.active = False
+        self.wake.set()
+        self.writer.join()
+        self.flush()
+        with self.write_lock:
+            for file in self.files.values():
+                file.close()
+            self.files = {}
+
+
+class Session:
+    """
+    Memory-mapped reader of a session directory
+
+    session["mood"]["arousal"] is a read-only numpy array of all rows, session.segment(i) gives the
+    rows of one recording.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: session directory written by SessionLog
+        """
+        self.directory = directory
+        with open(os.path.join(directory, "schema.json")) as file:
+            self.schema = json.load(file)
+        if self.schema["version"] > VERSION:
+            raise ValueError(f"session version {self.schema['version']} is newer than {VERSION}")
+        self.tables = {table: self._map(table, columns) for table, columns in self.schema["tables"].items()}
+
+    def _map(self, table, columns):
+        rows = stored_rows(self.directory, table, columns.items())
+        arrays = {}
+        for column, dtype in columns.items():
+            path = column_path(self.directory, table, column)
+            arrays[column] = np.memmap(path, dtype=dtype, mode="r", shape=(rows,)) if rows \
+                else np.zeros(0, dtype=dtype)
+        return arrays
+
+    def __getitem__(self, table):
+        return self.tables[table]
+
+    def __len__(self):
+        """
+        :return: number of segments
+        """
+        return len(self.tables["segments"]["time"])
+
+    def segment(self, index):
+        """
+        Rows of one recording
+        :param index: segment number, negative numbers count from the end
+        :return: dict table -> dict column -> array, the time column starts at 0 with the segment
+        """
+        segments = self.tables["segments"]
+        index = index % len(segments["time"])
+        start = segments["time"][index]
+        tables = {}
+        for table, columns in self.tables.items():
+            if table == "segments":
+                continue
+            # by row index, the times of two segments may overlap, e.g. replays that all start at 0
+            first = segments[table][index]
+            last = segments[table][index + 1] if index + 1 < len(segments["time"]) else len(columns["time"])
+            tables[table] = {column: np.array(array[first:last]) for column, array in columns.items()}
+            tables[table]["time"] -= start
+        return tables
+
+
+def read_session(directory):
+    """
+    :param directory: session directory written by SessionLog
+    :return: Session
+    """
+    return Session(directory)
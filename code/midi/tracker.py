@@ -1,57 +1,117 @@
+import math
 import time
 import numpy as np
 import threading
-from midi.message import MidiMessage
-from signal_evaluation.tempo import estimate_tempo
+from diagnostics.trace import traced
+from midi.chords import TONALITY, ChordRecognizer
+from midi.history import History
+from midi.message import decode
+from midi.mood_features import ChordWindow, MoodFeatures
+from midi.note_buffer import NoteBuffer
+from midi.velocity_window import VelocityWindow
+from signal_evaluation.tempo import TempoEstimator, estimate_beat_phase
 
 
 class MidiNoteTracker:
-    def __init__(self) -> None:
-        self.played_notes = []
+    def __init__(self, clock=time.time, threaded=True, latency=None, mood_interval=0.5, history=None,
+                 session_log=None, source_weights=None) -> None:
+        """
+        :param clock: function returning the current time in seconds, replaced by a virtual clock for replays
+        :param threaded: start the tempo and mood manager threads,
+                         without them estimate_tempo and estimate_mood have to be called by the owner
+        :param latency: LatencyMonitor to record the tracker stage of the notes in, None to not measure
+        :param mood_interval: seconds between two mood estimations
+        :param history: History that keeps the older values of the series on disk, None keeps them in memory
+        :param session_log: SessionLog the tempos, moods and highlights are written to, None to not log them
+        :param source_weights: dict source -> factor of the note velocities of that midi source,
+                               0 ignores its notes, unknown sources have factor 1
+        """
+        self.clock = clock
+        self.threaded = threaded
+        self.latency = latency
+        # 0.37 seconds is used in https://ieeexplore.ieee.org/abstract/document/6879451
+        self.tempo_interval = 0.37
+        self.mood_interval = mood_interval
+        # with a history directory the series keep a bounded tail in memory, older values are spilled to disk
+        self.history = history if history is not None else History()
+        self.session_log = session_log
+        self.source_weights = source_weights or {}
+        self.played_notes = NoteBuffer()
+        # running statistics of the mood window and the chords of the tonality window
+        self.mood_duration = 6
+        self.mood_features = MoodFeatures()
+        self.chord_duration = 2
+        self.chord_window = ChordWindow()
+        # velocities of the highlight window and of the intensity window
+        self.highlight_duration = 2
+        self.highlight_window = VelocityWindow()
+        self.intensity_duration = 0.1
+        self.intensity_window = VelocityWindow()
         self.notes_on_pedal = {}
+        # (source, note) -> state of a sounding note, the same note of two midi sources sounds twice
         self.active_notes = {}
-        self.last_note_durations = []
+        # pitch classes of the active notes
+        self.chord_recognizer = ChordRecognizer()
+        self.last_note_durations = self.history.create("note_durations", "f8", tail=1024)
         self.pedal_active = False
         self.new_note_event = threading.Event()
 
         self.tempo_manager = threading.Thread(target=self.manage_tempo, name="Tempo Manager")
         self.tempo_manager_active = False
 
-        self.calculated_tempos = []
-        self.estimated_chords = []  # (timestamp, root_note, chord_type)
+        self.tempo_estimator = TempoEstimator()
+        # estimate_tempo returns whole bpm
+        self.calculated_tempos = self.history.create("tempos", "i4")
+        # (timestamp, root pitch class, chord_type)
+        self.estimated_chords = self.history.create("chords", [("time", "f8"), ("root", "i1"), ("type", "U15")])
         self.bpm = None
+        # beat phase, estimated with every tempo from the onsets of the last beat_window seconds
+        self.beat_window = 4
+        # below this strength the onsets have no clear phase and no beats are predicted
+        self.min_beat_strength = 0.3
+        self.beat = None  # (timestamp of a beat, period, strength)
         self.mood_manager_active = False
         self.mood_manager = threading.Thread(target=self.manage_mood, name="Mood Manager")
 
         self.current_mood = None  # (arousal, valence)
-        self.all_arousal = []
-        self.all_valence = []
+        self.all_arousal = self.history.create("arousal", "f8")
+        self.all_valence = self.history.create("valence", "f8")
         self.mood_set = threading.Event()
 
         self.lock = threading.Lock()
 
         self.highlight_factor = None
         self.highlight_set = threading.Event()
-        self.highlight_timings = []
+        self.highlight_timings = self.history.create("highlights", [("time", "f8"), ("type", "i1")])
+        # (time.time() the note arrived, time.time() highlight_set was set) of the last highlight
+        self.highlight_stamp = None
 
-        self.tempo_manager.start()
+        if self.threaded:
+            self.tempo_manager.start()
 
     def reset(self):
         """
         Reset all values of the tracker
         :return:
         """
-        self.played_notes = []
+        self.played_notes.clear()
+        self.mood_features.clear()
+        self.chord_window.clear()
+        self.highlight_window.clear()
+        self.intensity_window.clear()
         self.notes_on_pedal = {}
         self.active_notes = {}
-        self.last_note_durations = []
+        self.chord_recognizer.clear()
+        self.last_note_durations.clear()
         self.pedal_active = False
-        self.calculated_tempos = []
-        self.estimated_chords = []
+        self.tempo_estimator.reset()
+        self.calculated_tempos.clear()
+        self.estimated_chords.clear()
         self.bpm = None
+        self.beat = None
         self.current_mood = None
-        self.all_arousal = []
-        self.all_valence = []
+        self.all_arousal.clear()
+        self.all_valence.clear()
         self.highlight_factor = None
 
     def shutdown(self):
@@ -63,7 +123,9 @@ class MidiNoteTracker:
         self.mood_manager_active = False
         self.new_note_event.set()
         self.mood_set.set()
-        self.tempo_manager.join()
+        if self.tempo_manager.is_alive():
+            self.tempo_manager.join()
+        self.history.close()
 
     def get_mood_value(self):
         """
@@ -79,6 +141,31 @@ class MidiNoteTracker:
         """
         return self.bpm
 
+    def get_beat(self):
+        """
+        Get the current beat phase
+        :return: tuple (timestamp of a beat, period, strength) or None
+        """
+        return self.beat
+
+    def get_next_beats(self, count=4, after=None, subdivision=1):
+        """
+        Predict the next beats from the estimated tempo and beat phase
+        :param count: number of beats
+        :param after: only beats later than this timestamp, defaults to now
+        :param subdivision: grid points per beat, 2 for eighth notes
+        :return: list of timestamps, empty if there is no tempo or no clear beat phase
+        """
+        beat = self.beat
+        if beat is None or beat[2] < self.min_beat_strength:
+            return []
+        if after is None:
+            after = self.clock()
+        beat_time, period, _ = beat
+        step = period / subdivision
+        first = math.floor((after - beat_time) / step) + 1
+        return [beat_time + (first + i) * step for i in range(count)]
+
     def get_highlight_value(self):
         """
         Get the current highlight factor
@@ -88,68 +175,95 @@ class MidiNoteTracker:
 
     def evaluate_midi_input(self, midi_message):
         """
-        Evaluate the midi message and call the corresponding function
-        :param midi_message:
-        :return:
-        """
-        m = MidiMessage(midi_message)
-        # note on
-        if m.is_note_on():
-            self.note_on(m.get_midi_note_number(), m.get_midi_velocity())
-            return "note_on"
-        # note off
-        elif m.is_note_off():
-            self.note_off(m.get_midi_note_number())
-            return "note_off"
-        # pedal on
-        elif m.is_pedal_on():
+        Evaluate the raw midi message and call the corresponding function
+        :param midi_message: tuple ([status, data1, data2], delta_time)
+        :return: type of the message as string
+        """
+        return self.evaluate_midi_event(decode(midi_message))
+
+    def evaluate_midi_event(self, event, received=None, source=None):
+        """
+        Evaluate the decoded midi message and call the corresponding function
+        :param event: MidiEvent
+        :param received: time.time() the message arrived, start of the latency measurement
+        :param source: midi source of the message, weighted with source_weights
+        :return: type of the message as string
+        """
+        event_type = event.type
+        weight = self.source_weights.get(source, 1)
+        if weight <= 0:
+            # ignored source, also its note offs and pedal
+            return event_type
+        if event_type == "note_on":
+            velocity = event.velocity
+            if weight != 1:
+                velocity = min(127, max(1, round(velocity * weight)))
+            self.note_on(event.note, velocity, received, source)
+        elif event_type == "note_off":
+            self.note_off(event.note, source)
+        elif event_type == "pedal_on":
             self.pedal_on()
-            return "pedal_on"
-        # pedal off
-        elif m.is_pedal_off():
+        elif event_type == "pedal_off":
             self.pedal_off()
-            return "pedal_off"
-        else:
-            return "unknown"
+        return event_type
 
-    def note_on(self, note, velocity):
+    @traced("tracker")
+    def note_on(self, note, velocity, received=None, source=None):
         """
         function to manage note_on events
         :param note:
         :param velocity:
+        :param received: time.time() the message arrived, defaults to now
+        :param source: midi source of the note
         :return:
         """
-        note_time = time.time()
+        if self.latency is not None:
+            start = time.time()
+            if received is None:
+                received = start
+        note_time = self.clock()
         self.new_note_event.set()
-        self.played_notes.append((note, time.time(), velocity))
+        self.played_notes.append(note, note_time, velocity)
+        self.mood_features.add(note, note_time, velocity)
+        self.highlight_window.add(note_time, velocity)
+        self.intensity_window.add(note_time, velocity)
         # with self.lock:
-        if note not in self.active_notes:
-            self.active_notes[note] = {'start_time': time.time(), 'velocity': velocity, 'pedal': self.pedal_active,
-                                       'pressed': True}
+        key = (source, note)
+        if key not in self.active_notes:
+            self.active_notes[key] = {'start_time': note_time, 'velocity': velocity, 'pedal': self.pedal_active,
+                                      'pressed': True}
+            self.chord_recognizer.note_on(note)
             if self.estimate_highlight(note_time):
+                if self.latency is not None:
+                    self.highlight_stamp = (received, time.time())
                 self.highlight_set.set()
             self.get_played_chord()
         else:
             # Handle case where note is already active (e.g., note-on event while note is still playing)
             pass
         self.new_note_event.clear()
+        if self.latency is not None:
+            self.latency.record("tracker", time.time() - start)
 
-    def note_off(self, note) -> None:
+    def note_off(self, note, source=None) -> None:
         """
         function to manage note_off events
         :param note:
+        :param source: midi source of the note, only ends the note of this source
         :return:
         """
-        if note in self.active_notes:
-            start_time = self.active_notes[note]['start_time']
-            end_time = time.time()
+        key = (source, note)
+        if key in self.active_notes:
+            start_time = self.active_notes[key]['start_time']
+            end_time = self.clock()
             duration = end_time - start_time
 
-            self.active_notes[note]['pressed'] = False
+            self.active_notes[key]['pressed'] = False
             # Remove the note from the active_notes dictionary
-            if not self.active_notes[note]['pedal']:
+            if not self.active_notes[key]['pedal']:
                 self.last_note_durations.append(duration)
-                del self.active_notes[note]
+                del self.active_notes[key]
+                self.chord_recognizer.note_off(note)
         else:
             # Handle case where note-off event is received without a corresponding note-on
             pass
@@ -160,8 +274,8 @@ class MidiNoteTracker:
         :return:
         """
         self.pedal_active = True
-        for note in self.active_notes:
-            self.active_notes[note]['pedal'] = True
+        for key in self.active_notes:
+            self.active_notes[key]['pedal'] = True
 
     def pedal_off(self) -> None:
         """
@@ -169,53 +283,25 @@ class MidiNoteTracker:
         :return:
         """
         self.pedal_active = False
-        notes_to_delete = [note for note in self.active_notes if not self.active_notes[note]['pressed']]
-        for note in self.active_notes:
-            self.active_notes[note]['pedal'] = False
-        for note in notes_to_delete:
-            del self.active_notes[note]
-
+        notes_to_delete = [key for key in self.active_notes if not self.active_notes[key]['pressed']]
+        for key in self.active_notes:
+            self.active_notes[key]['pedal'] = False
+        for key in notes_to_delete:
+            del self.active_notes[key]
+            self.chord_recognizer.note_off(key[1])
+
+    @traced("tracker")
     def get_played_chord(self):
         """
-        Estimate the chord that is currently played
-        :return:
+        Estimate the chord that is currently played and store it
+        The pitch classes of the active notes are kept up to date by note_on, note_off and pedal_off,
+        the chord is looked up in the precomputed table of midi.chords
+        :return: tuple (root pitch class, chord type) or None
         """
-
-        minor_major = {
-            "Major": [4, 11],
-            "Minor": [3, 10]
-
-        }
-
-        # Function to calculate the interval between two MIDI note numbers
-        def calculate_interval(note1, note2) -> int:
-            return (note2 - note1) % 12
-
-        def get_midi_note_name(note_id):
-            note = "C C#D D#E F F#G G#A A#B "
-            substring_start = (note_id % 12) * 2
-            note = note[substring_start:substring_start + 2]
-            return substring_start
-
-        sorted_active_notes = sorted(self.active_notes.keys())
-        if len(sorted_active_notes) == 0:
-            return []
-        # Find the root note (lowest pitch)
-        root_note = sorted_active_notes[0]
-        root_number = get_midi_note_name(root_note)
-
-        # Calculate intervals between the root note and other notes
-        intervals = list(dict.fromkeys(sorted([calculate_interval(root_note, note) for note in sorted_active_notes])))
-
-        # Check each known chord pattern
-        for interval in intervals:
-            if interval in minor_major["Major"]:
-                self.estimated_chords.append((time.time(), root_number, "Major"))
-                return
-            elif interval in minor_major["Minor"]:
-                self.estimated_chords.append((time.time(), root_number, "Minor"))
-                return
-        return
+        chord = self.chord_recognizer.chord()
+        if chord is not None:
+            self.add_chord((self.clock(), chord[0], chord[1]))
+        return chord
 
     def manage_tempo(self):
         """
@@ -224,22 +310,67 @@ class MidiNoteTracker:
         """
         self.tempo_manager_active = True
         while self.tempo_manager_active:
-            estimated_tempo = self.estimate_tempo()
-            if estimated_tempo is not None:
-                self.calculated_tempos.append(estimated_tempo)
+            self.update_tempo()
+            time.sleep(self.tempo_interval)
+
+    def update_tempo(self):
+        """
+        Estimate the tempo and store it
+        :return: estimated tempo in BPM or None
+        """
+        estimated_tempo = self.estimate_tempo()
+        if estimated_tempo is not None:
+            self.calculated_tempos.append(estimated_tempo)
+            if self.session_log is not None:
+                self.session_log.append("tempo", self.clock(), estimated_tempo)
+        self.estimate_beat_phase()
+        return estimated_tempo
+
+    def log_highlight(self, highlight_type):
+        """
+        Store the time of a highlight
+        :param highlight_type: 0 velocity, 1 intensity highlight
+        :return:
+        """
+        timestamp = self.clock()
+        self.highlight_timings.append((timestamp, highlight_type))
+        if self.session_log is not None:
+            self.session_log.append("highlight", timestamp, highlight_type)
 
-            # 0.37 seconds is used in https://ieeexplore.ieee.org/abstract/document/6879451
-            time.sleep(0.37)
+    def add_chord(self, chord):
+        """
+        Store an estimated chord
+        :param chord: tuple (timestamp, root_note, chord_type)
+        :return:
+        """
+        self.estimated_chords.append(chord)
+        self.chord_window.add(chord)
 
+    @traced("tracker")
     def estimate_tempo(self):
         """
         :return: estimated tempo in BPM
         """
-        self.bpm = estimate_tempo(self.played_notes)
-        if not self.mood_manager_active and self.bpm is not None:
+        self.bpm = self.tempo_estimator.estimate(self.played_notes, self.clock())
+        if self.threaded and not self.mood_manager_active and self.bpm is not None:
             self.mood_manager.start()
         return self.bpm
 
+    @traced("tracker")
+    def estimate_beat_phase(self):
+        """
+        Estimate the beat phase of the recent played notes with the current tempo
+        :return: tuple (timestamp of a beat, period, strength) or None
+        """
+        if not self.bpm:
+            self.beat = None
+            return None
+        period = 60 / self.bpm
+        _, timings, velocities = self.played_notes.window(self.clock() - self.beat_window)
+        phase = estimate_beat_phase(timings, period, velocities)
+        self.beat = None if phase is None else (phase[0], period, phase[1])
+        return self.beat
+
     def manage_mood(self):
         """
         Thread to manage the mood estimation
@@ -248,17 +379,28 @@ class MidiNoteTracker:
         print("Mood manager started")
         self.mood_manager_active = True
         while self.mood_manager_active:
-            estimated_mood = self.estimate_mood()
-            if estimated_mood is not None:
-                self.current_mood = estimated_mood
-                self.all_arousal.append(estimated_mood[0])
-                self.all_valence.append(estimated_mood[1])
-                self.mood_set.set()
-                time.sleep(0.5)
+            if self.update_mood() is not None:
+                time.sleep(self.mood_interval)
             else:
                 # wait until new note is played
                 self.new_note_event.wait()
 
+    def update_mood(self):
+        """
+        Estimate the mood, store it and signal the new mood
+        :return: tuple (arousal, valence) or None
+        """
+        estimated_mood = self.estimate_mood()
+        if estimated_mood is not None:
+            self.current_mood = estimated_mood
+            self.all_arousal.append(estimated_mood[0])
+            self.all_valence.append(estimated_mood[1])
+            if self.session_log is not None:
+                self.session_log.append("mood", self.clock(), estimated_mood[0], estimated_mood[1])
+            self.mood_set.set()
+        return estimated_mood
+
+    @traced("tracker")
     def estimate_mood(self):
         """
         Estimate the mood of the recent played notes
@@ -276,80 +418,62 @@ class MidiNoteTracker:
             return 1 / (1 + np.exp(-x))
 
         # get notes from last 10 seconds
-        duration = 6
-        start_time = time.time() - duration
-        played_notes = [note for note in self.played_notes if note[1] > start_time]
-        if len(played_notes) < 2:
-            return None
+        duration = self.mood_duration
+        start_time = self.clock() - duration
+        self.mood_features.expire(start_time)
 
-        # get velocities from last 10 seconds
-        velocities = [note[2] for note in played_notes]
-        timings = [note[1] for note in played_notes]
-        notes = [note[0] for note in played_notes]
+        # get number of notes but only count one note if multiple notes are played at the same time
+        # caluclate expected time between notes
+        tempo = self.bpm
+        # divide by 2 for eights
+        beat_interval = (60 / tempo)
+        beat_eights = beat_interval / 2
+        # possible offset
+        offset = 0.9
+        beat_eights_off = beat_eights * offset
+
+        # running statistics of the window, updated as the notes are played and expire
+        features = self.mood_features.snapshot(beat_eights_off)
+        if features is None or features["count"] < 2:
+            return None
 
         # get highest velocity
-        max_velocity = max(velocities)
+        max_velocity = features["max_velocity"]
         # get timestemp of highest velocity
         # to remove divide by 0
-        max_velocity_time = abs(
-            [note[1] for note in played_notes if note[2] == max_velocity][0] - time.time()) + 0.00001
+        max_velocity_time = abs(features["max_velocity_time"] - self.clock()) + 0.00001
 
         # get frequency range
         # lowest note
-        lowest_note = min(notes)
+        lowest_note = features["lowest_note"]
         # highest note
-        highest_note = max(notes)
+        highest_note = features["highest_note"]
         # frequency range
         t_range = highest_note - lowest_note
 
-        # get number of notes but only count one note if multiple notes are played at the same time
-        # caluclate expected time between notes
-        tempo = self.bpm
-        # divide by 2 for eights
-        beat_interval = (60 / tempo)
-        beat_eights = beat_interval / 2
-        # possible offset
-        offset = 0.9
-        beat_eights_off = beat_eights * offset
-        # get notes that are not played at the same time
-
-        # sort notes by time
-        timings.sort()
-        # calculate time differences between notes
-        time_diff = [timings[i] - timings[i - 1] for i in range(1, len(timings))]
-        # only take time differences that are bigger than the beat interval
-        time_diff = [diff for diff in time_diff if diff > beat_eights_off]
-        # calculate number of notes
-        number_of_notes = len(time_diff) + 1
+        # number of notes with a time difference bigger than the beat interval to the previous one
+        number_of_notes = features["onsets"]
 
         # length of played notes
         # get up to last 30 note durations
         last_note_durations = self.last_note_durations[-30:]
         # calculate average note duration
-        avg_duration = np.mean(last_note_durations)
+        avg_duration = sum(last_note_durations) / len(last_note_durations) if last_note_durations else math.nan
         # calculate average note duration in relation to beat interval
         avg_duration_rel = avg_duration / beat_interval
         # rate it into -1 and 1 on sigmoid function
         avg_duration_rel = sigmoid(avg_duration_rel)
 
         # analyze chords from last 2 seconds
-        chord_duration = 2
-        chord_time = time.time() - chord_duration
-        chords = [chord for chord in self.estimated_chords if chord[0] > chord_time]
-        if len(chords) == 0:
+        chord_time = self.clock() - self.chord_duration
+        self.chord_window.expire(chord_time)
+        # get the most common chord
+        chord = self.chord_window.most_common()
+        if chord is None:
             val_tonality = 0
         else:
-            # get the most common chord
-            chord = max(set(chords), key=chords.count)
-            # get the type of the chord
-            chord_type = chord[2]
-            # get the tonality of the chord
-            if chord_type == "Major":
-                val_tonality = 1
-            elif chord_type == "Minor":
-                val_tonality = -1
-            else:
-                val_tonality = 0
+            # get the tonality of the chord type
+            val_tonality = TONALITY.get(chord[2], 0)
 
         # calculate some arousal and valence score from -1 to 1
         # arousal setzt sich zusammen aus lautstärke und anzahl der anschläge und der länge der noten
@@ -367,20 +491,20 @@ class MidiNoteTracker:
         # standard deviation of notes
         # valence
         # zwischen 5 und 15 linear auf -1 und 1
-        std_notes = np.std(notes)
-        val_std_notes = np.clip((std_notes - 10) / 5, -1, 1)
+        std_notes = features["std_notes"]
+        val_std_notes = min(max((std_notes - 10) / 5, -1), 1)
 
         # spectral centroid
         # valence
         # 60 ist mittleres C, 50 ist niedrig, 70 ist hoch
-        centroid = np.average(notes, weights=velocities)
-        val_centroid = np.clip((centroid - 60) / 10, -1, 1)
+        centroid = features["centroid"]
+        val_centroid = 0 if centroid is None else min(max((centroid - 60) / 10, -1), 1)
 
         # arousal
 
         # intensity - summe aller velocities
         # Arousal - irgendwas von mehreren tausend, sinnvoller im vergleich zum letzten zu schauen
-        intensity = sum(velocities)
+        # intensity = velocity_sum der features
         # aro_intensity =
 
         # Anzahl der Anschläge
@@ -393,12 +517,13 @@ class MidiNoteTracker:
         aro_max_velocity = sigmoid((max_velocity - 63.5) / 6.35) * 2 - 1
 
         # average velocity
-        aro_avg_velocity = sigmoid((np.mean(velocities) - 63.5) / 6.35) * 2 - 1
+        mean_velocity = features["mean_velocity"]
+        aro_avg_velocity = sigmoid((mean_velocity - 63.5) / 6.35) * 2 - 1
 
         # maximale velocity gewichten, mit der Zeit abnehmend
         weight = min(max(-((np.log(max_velocity_time)) / 2) + 1, 0), 1)
         weighted_max = max_velocity * weight
-        weighted_velocity = (np.mean(velocities) + weighted_max) / (1 + weight)
+        weighted_velocity = (mean_velocity + weighted_max) / (1 + weight)
         aro_weighted_velocity = sigmoid((weighted_velocity - 63.5) / 6.35) * 2 - 1
 
         # weight arousal and valence factors and return a tuple
@@ -406,6 +531,7 @@ class MidiNoteTracker:
         valence = (val_range + val_high + val_low + val_centroid + val_std_notes) / 5
         return arousal, valence
 
+    @traced("tracker")
     def estimate_highlight(self, note_time):
         """
         Estimate if the played note should be highlighted
@@ -415,29 +541,34 @@ class MidiNoteTracker:
 
         if len(self.played_notes) < 5:
             return False
-        played_note = self.played_notes[-1]
+        played_note = self.played_notes.last()
         played_note_velocity = played_note[2]
 
         # average velocity last 3 seconds:
-        start_time = time.time() - 2
-        last_notes = [note for note in self.played_notes if note[1] > start_time]
-        if len(last_notes[1:]) == 0:
+        now = self.clock()
+        window = self.highlight_window
+        window.expire(now - self.highlight_duration)
+        # statistics of the window without its oldest note, from the running sums
+        count = len(window) - 1
+        if count <= 0:
             return False
-        avg_velocity = np.mean([note[2] for note in last_notes[1:]])
-        # standard deviation of velocities
-        std_velocity = np.std([note[2] for note in last_notes[1:]])
+        first_velocity = window.first()
+        velocity_sum = window.velocity_sum - first_velocity
+        square_sum = window.square_sum - first_velocity * first_velocity
+        avg_velocity = velocity_sum / count
+        # standard deviation of velocities, exact integer variance numerator
+        std_velocity = math.sqrt(count * square_sum - velocity_sum * velocity_sum) / count
 
         # if played note is 1.2 standard deviations higher than average velocity
         if played_note_velocity > avg_velocity + 1.2 * std_velocity:
             self.highlight_factor = played_note_velocity / avg_velocity
-            self.highlight_timings.append((time.time(),0))
+            self.log_highlight(0)
             return True
         # intensity über lautstärke der noten
-        intensity_time = time.time() - 0.1
-        intensity_notes = [note for note in last_notes if note[1] > intensity_time]
-        intensity = sum([note[2] for note in intensity_notes])
+        self.intensity_window.expire(now - self.intensity_duration)
+        intensity = self.intensity_window.velocity_sum
         if intensity > 400:
             self.highlight_factor = intensity / 400
-            self.highlight_timings.append((time.time(),1))
+            self.log_highlight(1)
             return True
         return False
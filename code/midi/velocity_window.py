@@ -0,0 +1,54 @@
+from collections import deque
+
+
+class VelocityWindow:
+    """
+    Count, sum and squared sum of the velocities in a sliding time window
+
+    The sums are integers, so adding and removing notes never accumulates rounding errors
+    and mean and standard deviation cost the same for any number of played notes.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """
+        Remove all notes
+        :return:
+        """
+        self.notes = deque()  # (time, velocity), sorted by time
+        self.velocity_sum = 0
+        self.square_sum = 0
+
+    def __len__(self):
+        return len(self.notes)
+
+    def add(self, time, velocity):
+        """
+        Add a note, not older than the last added one
+        :param time:
+        :param velocity:
+        :return:
+        """
+        velocity = int(velocity)
+        self.notes.append((time, velocity))
+        self.velocity_sum += velocity
+        self.square_sum += velocity * velocity
+
+    def expire(self, start_time):
+        """
+        Move the start of the window, notes played at or before start_time are removed
+        :param start_time:
+        :return:
+        """
+        while self.notes and self.notes[0][0] <= start_time:
+            _, velocity = self.notes.popleft()
+            self.velocity_sum -= velocity
+            self.square_sum -= velocity * velocity
+
+    def first(self):
+        """
+        :return: velocity of the oldest note in the window
+        """
+        return self.notes[0][1]
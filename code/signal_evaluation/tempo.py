@@ -1,7 +1,7 @@
 import numpy as np
 import time
+from numpy.lib.stride_tricks import sliding_window_view
 from scipy import signal
-from scipy.interpolate import interp1d
 
 
 def create_pulse_train(peak, corr, v, weight):
@@ -27,43 +27,70 @@ def create_pulse_train(peak, corr, v, weight):
     return pulse_train
 
 
+# pulse trains as (v, weight), each one has pulses at 0, 1, 2 and 3 times v * peak
+PULSE_TRAINS = ((1, 1), (1.5, 0.5), (2, 0.5))
+
+
+def pulse_train_taps(peak, length):
+    """
+    Non-zero positions of the combined pulse train for a peak, the sparse form of
+    create_pulse_train(peak, corr, v, weight) summed over PULSE_TRAINS
+    :param peak:
+    :param length: length of the autocorrelation
+    :return: dict position -> weight
+    """
+    taps = {}
+    for v, weight in PULSE_TRAINS:
+        for i in range(4):
+            position = int(peak * i * v)
+            if position < length:
+                taps[position] = taps.get(position, 0) + weight
+    return taps
+
+
+def score_pulse_trains(corr, peaks):
+    """
+    Score the combined pulse trains of all peaks at once
+    The cross correlation with a pulse train is a weighted sum of shifted copies of corr,
+    so all candidates are one matrix product of the tap weights with the shifted copies
+    :param corr:
+    :param peaks:
+    :return: score (max + variance of the cross correlation) for every peak
+    """
+    length = len(corr)
+    if len(peaks) == 0:
+        return np.zeros(0)
+    taps = [pulse_train_taps(peak, length) for peak in peaks]
+    positions = sorted(set().union(*taps))
+    columns = {position: column for column, position in enumerate(positions)}
+    weights = np.zeros((len(peaks), len(positions)))
+    for row, peak_taps in enumerate(taps):
+        for position, weight in peak_taps.items():
+            weights[row, columns[position]] = weight
+
+    # full cross correlation: cross_corr[k] = sum of weight * corr[k - (length - 1) + position]
+    padded = np.zeros(3 * length - 2)
+    padded[length - 1:2 * length - 1] = corr
+    shifted = sliding_window_view(padded, 2 * length - 1)[positions]
+    cross_corr = weights @ shifted
+    return np.max(cross_corr, axis=1) + np.var(cross_corr, axis=1)
+
+
 def evaluate_pulse_trains(corr, peaks, sampling_rate):
     """
     Evaluate pulse trains for given peaks
     :param corr:
     :param peaks:
     :param sampling_rate:
-    :return:
+    :return: estimated tempo of the best peak and its score
     """
-    # Evaluate pulse trains
-    # For each peak, evaluate the pulse train
-    highest_score = 0
-    estimated_tempo = 0
-    for peak in peaks:
-        pulse_train = np.zeros(len(corr))
-        # v = 1, weight 1
-        pulse_train_1 = create_pulse_train(peak, corr, 1, 1)
-        # v = 1.5, weight 0.5
-        pulse_train_15 = create_pulse_train(peak, corr, 1.5, 0.5)
-        # v = 2, weight 0.5
-        pulse_train_2 = create_pulse_train(peak, corr, 2, 0.5)
-
-        # combined pulse train
-        combined_pulse_train = pulse_train_1 + pulse_train_15 + pulse_train_2
-
-        # cross correlate with original signal
-        cross_corr = signal.correlate(corr, combined_pulse_train, mode='full')
-
-        # find max of cross correlation
-        max_corr = np.max(cross_corr)
-        # find variance of cross correlation
-        var_corr = np.var(cross_corr)
-
-        score = max_corr + var_corr
-        if score > highest_score:
-            highest_score = score
-            estimated_tempo = int(60 * sampling_rate / peak)
-    return estimated_tempo, highest_score
+    scores = score_pulse_trains(corr, peaks)
+    # the first peak with the highest positive score wins
+    valid = scores > 0
+    if not np.any(valid):
+        return 0, 0
+    best = np.argmax(np.where(valid, scores, -np.inf))
+    return int(60 * sampling_rate / peaks[best]), scores[best]
 
 
 def find_top_peaks(corr, sampling_rate, num_peaks=5, min_distance=10):
@@ -89,6 +116,61 @@ def find_top_peaks(corr, sampling_rate, num_peaks=5, min_distance=10):
     return top_peaks, corr[top_peaks]
 
 
+class CorrEnhancer:
+    """
+    Time-stretch step of enhance_corr with precomputed interpolation tables
+
+    The stretched versions A(2t) and A(4t) only depend on the length of the autocorrelation,
+    so the interpolation indices and weights are computed once and the output buffers are reused.
+    The result of enhance is overwritten by the next call.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        x = np.arange(length, dtype=np.float64)
+        self.tables = []
+        for factor in (2, 4):
+            # same grid and interval lookup as interp1d(x, corr, kind='linear') on linspace(...)[:length]
+            x_new = np.linspace(0, length - 1, factor * length)[:length]
+            hi = np.searchsorted(x, x_new).clip(1, length - 1)
+            lo = hi - 1
+            self.tables.append((lo, hi, x_new - x[lo]))
+        self._lo_values = np.empty(length)
+        self._hi_values = np.empty(length)
+        self._stretched = np.empty(length)
+        self._enhanced = np.empty(length)
+
+    def stretch(self, corr, table, out):
+        """
+        Linear interpolation of corr on a stretched grid
+        :param corr:
+        :param table: (lo, hi, weight) from self.tables
+        :param out: output array
+        :return: out
+        """
+        lo, hi, weight = table
+        np.take(corr, lo, out=self._lo_values)
+        np.take(corr, hi, out=self._hi_values)
+        np.subtract(self._hi_values, self._lo_values, out=out)
+        np.multiply(out, weight, out=out)
+        np.add(out, self._lo_values, out=out)
+        return out
+
+    def enhance(self, corr):
+        """
+        Enhanced autocorrelation: EAC_m(t) = A_m(t) + A_m(2*t) + A_m(4*t)
+        :param corr:
+        :return: enhanced autocorrelation, valid until the next call
+        """
+        enhanced = self._enhanced
+        np.add(corr, self.stretch(corr, self.tables[0], self._stretched), out=enhanced)
+        np.add(enhanced, self.stretch(corr, self.tables[1], self._stretched), out=enhanced)
+        return enhanced
+
+
+_enhancer_tables = {}
+
+
 def enhance_corr(corr):
     """
     Enhance the autocorrelation function by adding time-stretched versions of the original signal
@@ -97,17 +179,15 @@ def enhance_corr(corr):
     """
     # Length of the original array
     length = len(corr)
+    if length not in _enhancer_tables:
+        _enhancer_tables[length] = CorrEnhancer(length).tables
+    tables = _enhancer_tables[length]
 
     # Create time-stretched versions of the array by factors of 2 and 4
-    x = np.arange(length)
-    interp_func_2 = interp1d(x, corr, kind='linear', fill_value="extrapolate")
-    interp_func_4 = interp1d(x, corr, kind='linear', fill_value="extrapolate")
-
-    x2 = np.linspace(0, length - 1, 2 * length)
-    x4 = np.linspace(0, length - 1, 4 * length)
-
-    corr_2t = interp_func_2(x2)[:length]  # Downsample to original length
-    corr_4t = interp_func_4(x4)[:length]  # Downsample to original length
+    corr_2t = np.empty(length)
+    corr_4t = np.empty(length)
+    for stretched, (lo, hi, weight) in zip((corr_2t, corr_4t), tables):
+        stretched[:] = (corr[hi] - corr[lo]) * weight + corr[lo]
 
     # Enhanced autocorrelation: EAC_m(t) = A_m(t) + A_m(2*t) + A_m(4*t)
     enhanced_corr = corr + corr_2t + corr_4t
@@ -115,44 +195,190 @@ def enhance_corr(corr):
     return enhanced_corr
 
 
-def estimate_tempo(played_notes):
+def tempo_from_autocorrelation(corr, sampling_rate, enhancer=None):
+    """
+    Pick the tempo from the autocorrelation of the onset signal
+    :param corr: autocorrelation for the non-negative lags, lag 0 first
+    :param sampling_rate:
+    :param enhancer: CorrEnhancer for len(corr) to reuse, enhance_corr is used if None
+    :return: estimated tempo in bpm
+    """
+    corr = corr / np.max(corr)
+
+    # cut peak at 0-5
+    corr[0:5] = 0
+
+    # enhance harmonics nach paper
+    if enhancer is None:
+        corr = enhance_corr(corr)
+    else:
+        corr = enhancer.enhance(corr)
+
+    # pick top 5 peaks, some sorted
+    peaks, values = find_top_peaks(corr, sampling_rate, num_peaks=5, min_distance=20)
+    # Evaluate Pulse trains
+    estimated_tempo, highest_score = evaluate_pulse_trains(corr, peaks, sampling_rate)
+    if estimated_tempo < 58:
+        estimated_tempo = estimated_tempo * 2
+    return estimated_tempo
+
+
+def estimate_tempo(played_notes, now=None):
     """
     Estimate tempo using scipy autocorrelation and based on paper
+    :param played_notes: NoteBuffer of the played notes
+    :param now: current timestamp, defaults to time.time()
     :return: estimated tempo in bpm
     """
     sampling_rate = 344
     # window of 2048 samples
     duration = 2048 / sampling_rate  # seconds
     # get notes from last X seconds
-    start_time = time.time() - duration
-    note_timings = [(note[1], note[2]) for note in played_notes if note[1] > start_time]
+    if now is None:
+        now = time.time()
+    start_time = now - duration
+    _, timings, velocities = played_notes.window(start_time)
 
-    if len(note_timings) < 4:
+    if len(timings) < 4:
         return None
-    zero_time = note_timings[0][0]
-    note_timings = [(note[0] - zero_time, note[1]) for note in note_timings]
+    zero_time = timings[0]
 
     signal_data = np.zeros(int(duration * sampling_rate))
-    for timing in note_timings:
-        sample_index = int(np.floor(timing[0] * sampling_rate))
-        # use velocity as y value to emphasize strong onsets
-        signal_data[sample_index] = timing[1]
-        # signal_data[sample_index] = 1
+    sample_indices = np.floor((timings - zero_time) * sampling_rate).astype(int)
+    # use velocity as y value to emphasize strong onsets
+    signal_data[sample_indices] = velocities
     corr = signal.correlate(signal_data, signal_data, mode='full')
-    corr = corr / np.max(corr)
     # cut negative half off, since its mirrored
     corr = corr[len(corr) // 2:]
+    return tempo_from_autocorrelation(corr, sampling_rate)
 
-    # cut peak at 0-5
-    corr[0:5] = 0
 
-    # enhance harmonics nach paper
-    corr = enhance_corr(corr)
+def estimate_beat_phase(timings, period, weights=None):
+    """
+    Estimate where the beats lie with the circular mean of the onset positions within one beat
+    :param timings: onset timestamps, sorted
+    :param period: beat period in seconds, 60 / bpm
+    :param weights: weight of every onset, e.g. the velocities, defaults to equal weights
+    :return: tuple (timestamp of a beat, strength from 0 = no common phase to 1 = all onsets on the grid) or None
+    """
+    if len(timings) == 0 or period <= 0:
+        return None
+    # relative to the last onset, absolute timestamps would cost precision
+    reference = timings[-1]
+    angles = 2 * np.pi * (np.asarray(timings) - reference) / period
+    weights = np.ones(len(angles)) if weights is None else np.asarray(weights, dtype=float)
+    total = np.sum(weights)
+    if total <= 0:
+        return None
+    x = np.dot(weights, np.cos(angles))
+    y = np.dot(weights, np.sin(angles))
+    strength = np.hypot(x, y) / total
+    return reference + np.arctan2(y, x) / (2 * np.pi) * period, float(strength)
 
-    # pick top 5 peaks, some sorted
-    peaks, values = find_top_peaks(corr, sampling_rate, num_peaks=5, min_distance=20)
-    # Evaluate Pulse trains
-    estimated_tempo, highest_score = evaluate_pulse_trains(corr, peaks, sampling_rate)
-    if estimated_tempo < 58:
-        estimated_tempo = estimated_tempo * 2
-    return estimated_tempo
+
+class TempoEstimator:
+    """
+    Streaming version of estimate_tempo
+
+    Keeps the onset signal of the current window and its autocorrelation between calls.
+    Onsets entering or leaving the window are applied as single sample changes,
+    each one updates the autocorrelation in O(window) instead of O(window^2).
+    Gives the same tempo as estimate_tempo, velocities are integers so all sums are exact.
+    """
+
+    def __init__(self, sampling_rate=344, window_size=2048):
+        self.sampling_rate = sampling_rate
+        self.window_size = window_size
+        self.duration = window_size / sampling_rate  # seconds
+        self.signal_data = np.zeros(window_size)
+        # autocorrelation of signal_data for the lags 0 .. window_size - 1
+        self.corr = np.zeros(window_size)
+        self._target = np.zeros(window_size)
+        self.enhancer = CorrEnhancer(window_size)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget all onsets
+        :return:
+        """
+        self.signal_data[:] = 0
+        self.corr[:] = 0
+        # absolute note buffer indices of the onsets in the window
+        self._first = 0
+        self._end = 0
+        # time of sample 0, the first onset in the window
+        self._zero_time = None
+        self._tempo = None
+
+    def estimate(self, played_notes, now=None):
+        """
+        Estimate the tempo of the notes in the last window
+        :param played_notes: NoteBuffer of the played notes
+        :param now: current timestamp, defaults to time.time()
+        :return: estimated tempo in bpm or None if less than 4 notes were played
+        """
+        if now is None:
+            now = time.time()
+        first, _, timings, velocities = played_notes.indexed_window(now - self.duration)
+        end = first + len(timings)
+        if first == self._first and end == self._end:
+            return self._tempo
+        self._update(first, end, timings, velocities)
+        if len(timings) < 4:
+            self._tempo = None
+        else:
+            self._tempo = tempo_from_autocorrelation(self.corr, self.sampling_rate, self.enhancer)
+        return self._tempo
+
+    def _update(self, first, end, timings, velocities):
+        """
+        Bring signal_data and corr to the onsets first .. end of the note buffer
+        :return:
+        """
+        if first < self._first or end < self._end or len(timings) == 0:
+            # the note buffer was cleared or the window is empty
+            self.reset()
+        if len(timings) == 0:
+            self._first = self._end = first
+            return
+        if self._zero_time is not None and timings[0] != self._zero_time:
+            # the first onset defines sample 0, everything before the new first onset left the window
+            shift = min(int(np.floor((timings[0] - self._zero_time) * self.sampling_rate)), self.window_size)
+            for index in np.flatnonzero(self.signal_data[:shift]):
+                self._set_sample(index, 0)
+            # the autocorrelation does not change when the signal is moved
+            self.signal_data[:self.window_size - shift] = self.signal_data[shift:]
+            self.signal_data[self.window_size - shift:] = 0
+        self._zero_time = timings[0]
+
+        # onset signal like estimate_tempo builds it, apply every sample that differs,
+        # these are new onsets and the few onsets whose sample index rounds differently to the new start
+        target = self._target
+        target[:] = 0
+        sample_indices = np.floor((timings - self._zero_time) * self.sampling_rate).astype(int)
+        target[sample_indices] = velocities
+        for index in np.flatnonzero(target != self.signal_data):
+            self._set_sample(index, target[index])
+        self._first = first
+        self._end = end
+
+    def _set_sample(self, index, value):
+        """
+        Set one sample of the onset signal and update the autocorrelation
+        corr[k] changes by the difference times the two samples k away from index
+        :param index: sample index
+        :param value: new sample value
+        :return:
+        """
+        s = self.signal_data
+        old = s[index]
+        difference = value - old
+        if difference == 0:
+            return
+        self.corr[0] += value * value - old * old
+        if index + 1 < self.window_size:
+            self.corr[1:self.window_size - index] += difference * s[index + 1:]
+        if index > 0:
+            self.corr[1:index + 1] += difference * s[index - 1::-1]
+        s[index] = value
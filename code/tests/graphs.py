@@ -1,11 +1,16 @@
 # read in file
-import re
+import glob
+import sys
 
 import matplotlib.pyplot as plt
-import pandas as pd
 import numpy as np
 import wave
-d = pd.read_csv("../mood_data.csv", sep=";")
+
+sys.path.append("..")
+from midi.session_log import read_session
+
+# session directory of main.py, defaults to the latest one
+session = read_session(sys.argv[1] if len(sys.argv) > 1 else sorted(glob.glob("../sessions/*"))[-1])
 # print(d.head())
 
 # arou = []
@@ -32,36 +37,14 @@ d = pd.read_csv("../mood_data.csv", sep=";")
 # plt.plot(x_a[0], arou[0])
 
 ### Mood
-arou = []
-x_a = []
-for i,line in enumerate(d["arousal"]):
-    data_points = []
-    if i == 24:
-        print("test")
-        print(line)
-        line = re.sub('[^0-9,.-]', '', line)
-        print(line)
-        arr = line.split(",")
-        for x,a in enumerate(arr):
-            data_points.append(float(a))
-        arou.append(data_points)
-        x_a.append(np.linspace(0,60, len(arr)))
+# seconds since the start of the recording
+mood = session.segment(24)["mood"]
+arou = [mood["arousal"]]
+x_a = [mood["time"]]
 
 # draw red vertikal line at the timestamps
-valence = []
-x_v = []
-for i,line in enumerate(d["valence"]):
-    data_points = []
-    if i == 24:
-        print("test")
-        print(line)
-        line = re.sub('[^0-9,.-]', '', line)
-        print(line)
-        arr = line.split(",")
-        for x,a in enumerate(arr):
-            data_points.append(float(a))
-        valence.append(data_points)
-        x_v.append(np.linspace(0,60, len(arr)))
+valence = [mood["valence"]]
+x_v = [mood["time"]]
 
 
 
@@ -96,32 +79,17 @@ plt.show()
 
 ### Highlight
 
-for i,line in enumerate(d["highlight"]):
-    timestamps = []
-    types = []
-    if i == 22:
-        print("test")
-        print(line)
-        line = re.sub('[^0-9,.]', '', line)
-        print(line)
-        arr = line.split(",")
-        for x,a in enumerate(arr):
-            if x%2 == 0:
-                timestamps.append(float(a))
-            else:
-                types.append(int(a))
-        print(timestamps)
-        #reduce times so lowest is 0
-        timestamps = [x - timestamps[0] for x in timestamps]
-        print(timestamps)
-        #remove all timestamps over 60
-        timestamps = [x for x in timestamps if x <= 60]
-        # timestamps = [x for x in timestamps if x >= 10]
-        # timestamps = [x - timestamps[0] for x in timestamps]
-        print(types)
-        print(timestamps)
-
-        #     print(a.split("(")[1].strip(")"))
+highlight = session.segment(22)["highlight"]
+timestamps = highlight["time"]
+types = highlight["type"]
+#reduce times so lowest is 0
+timestamps = timestamps - timestamps[0]
+#remove all timestamps over 60
+timestamps = timestamps[timestamps <= 60]
+# timestamps = [x for x in timestamps if x >= 10]
+# timestamps = [x - timestamps[0] for x in timestamps]
+print(types)
+print(timestamps)
 # draw red vertikal line at the timestamps
 
 